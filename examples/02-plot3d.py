@@ -1,10 +1,19 @@
 # pylint: disable=invalid-name, no-member, unused-argument
-""" basic 3D points plot """
+""" basic 3D points plot
+
+    $ python 02-plot3d.py [points.f32]
+
+plots a raw file of float32 (x, y, z) if given, memory-mapped and
+uploaded in chunks without a copy (see dynbuffer).
+"""
+import sys
 
 import numpy as np
 from vispy import app, gloo
 from vispy.util.transforms import perspective, translate, rotate
 
+from dynbuffer import DynamicBuffer, as_rows
+
 vertex = """
 uniform mat4   u_model;         // Model matrix
 uniform mat4   u_view;          // View matrix
@@ -37,7 +46,7 @@ class Canvas(app.Canvas):
         Parameters
         ----------
         data : array_like
-            3D data, Nx3
+            3D data, Nx3, float32 arrays (a np.memmap) are not copied
         theta : float
             rotation around y axis
         phi : float
@@ -60,7 +69,9 @@ class Canvas(app.Canvas):
         program["u_model"] = model
         program["u_view"] = view
         program["u_projection"] = projection
-        program["a_position"] = data
+        self.positions = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self.positions.set(as_rows(data, np.float32, 3))
+        program["a_position"] = self.positions.buffer
 
         # bind
         self.program = program
@@ -103,14 +114,17 @@ class Canvas(app.Canvas):
         self.program.draw("line_strip")
 
 
-# 1000x3
-N = 1000
-data3d = np.c_[
-    np.sin(np.linspace(-10, 10, N) * np.pi),
-    np.cos(np.linspace(-10, 10, N) * np.pi),
-    np.linspace(-2, 2, N),
-]
-data3d = data3d.astype(np.float32)
+if len(sys.argv) > 1:
+    data3d = np.memmap(sys.argv[1], dtype=np.float32, mode="r").reshape(-1, 3)
+else:
+    # 1000x3
+    N = 1000
+    data3d = np.c_[
+        np.sin(np.linspace(-10, 10, N) * np.pi),
+        np.cos(np.linspace(-10, 10, N) * np.pi),
+        np.linspace(-2, 2, N),
+    ]
+    data3d = data3d.astype(np.float32)
 
 # plot
 c = Canvas(data3d)
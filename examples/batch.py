@@ -0,0 +1,275 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" batch rendering of many meshes or timesteps to an output sink
+
+a BatchRenderer is the Canvas of tetplot-gloo.py without a window: the
+same program and grow-only buffers (see tetgloo.TetProgram) and one
+framebuffer. frames are (points, colors, simplices) tuples read from
+an iterator, the topology is extracted again only when the simplices
+change, and every image is handed to a sink as soon as it is read back,
+so a long time series is streamed, not held in memory. the readback is
+asynchronous and the sink runs in a writer thread, see capture.
+
+sinks implement write(img) and close():
+    PNGSink : a sequence of numbered png files
+    NpyStackSink : one (frames, height, width, 4) uint8 .npy file
+    PipeSink : raw RGBA frames to the stdin of an encoder (ffmpeg)
+"""
+from __future__ import absolute_import
+
+import struct
+import subprocess
+
+import numpy as np
+from vispy import app, gloo
+
+from capture import Recorder
+from offscreen import save_image, use_headless
+from tetgloo import TetProgram
+from topology import sim2boundary, sim2edge, sim2tri
+
+# faces drawn by the renderer
+EXTRACT = {"triangles": sim2tri, "boundary": sim2boundary}
+
+
+class PNGSink(object):
+    """numbered png files, pattern is formatted with the frame number"""
+
+    def __init__(self, pattern="frame-%05d.png"):
+        self.pattern = pattern
+        self.count = 0
+
+    def write(self, img):
+        """save one image"""
+        save_image(self.pattern % self.count, img)
+        self.count += 1
+
+    def close(self):
+        """nothing to flush"""
+
+
+def _npy_header(shape, dtype, size=128):
+    """fixed size .npy (version 1.0) header, it can be rewritten in place"""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        np.dtype(dtype).str,
+        tuple(shape),
+    )
+    header = header.ljust(size - 11) + "\n"
+    magic = b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header))
+    return magic + header.encode("latin1")
+
+
+class NpyStackSink(object):
+    """a (frames, height, width, 4) uint8 .npy stack, written frame by frame
+
+    the number of frames is not known in advance, the header is written
+    again with the final shape by close(), the file can be opened with
+    np.load(filename, mmap_mode='r').
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, "wb")
+        self.shape = None
+        self.count = 0
+        self.file.write(_npy_header((0, 0, 0, 4), np.uint8))
+
+    def write(self, img):
+        """append one image"""
+        if self.shape is None:
+            self.shape = img.shape
+        elif img.shape != self.shape:
+            raise ValueError("all the frames of a stack must have the same size")
+        self.file.write(np.ascontiguousarray(img, dtype=np.uint8).tobytes())
+        self.count += 1
+
+    def close(self):
+        """write the final shape in the header"""
+        if self.file.closed:
+            return
+        shape = (self.count,) + (self.shape or (0, 0, 4))
+        self.file.seek(0)
+        self.file.write(_npy_header(shape, np.uint8))
+        self.file.close()
+
+
+def ffmpeg_command(filename, size, fps=30):
+    """ffmpeg reading raw RGBA frames of size (width, height) on stdin"""
+    return [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgba",
+        "-s",
+        "%dx%d" % tuple(size),
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+        "-pix_fmt",
+        "yuv420p",
+        filename,
+    ]
+
+
+class PipeSink(object):
+    """raw RGBA frames written to the stdin of an encoder process"""
+
+    def __init__(self, command):
+        """command is a list of arguments, e.g. ffmpeg_command('out.mp4', size)"""
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, img):
+        """send one image"""
+        self.process.stdin.write(np.ascontiguousarray(img, dtype=np.uint8).tobytes())
+
+    def close(self):
+        """close stdin and wait for the encoder"""
+        if self.process.stdin.closed:
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError("encoder exited with %d" % self.process.returncode)
+
+
+class BatchRenderer(app.Canvas):
+    """offscreen canvas rendering frames with a single program"""
+
+    def __init__(
+        self,
+        size=(512, 512),
+        mode="triangles",
+        face_color=(1.0, 1.0, 1.0, 0.6),
+        edge_color=None,
+        backend=None,
+    ):
+        """initialize the program, buffers and framebuffer
+
+        Parameters
+        ----------
+        size : (int, int)
+            (width, height) of the images
+        mode : str
+            'triangles' draws all the faces, 'boundary' the outer surface
+        face_color, edge_color : RGBA
+            multiply the vertex colors, the edges are drawn if edge_color
+            is given
+        backend : str
+            vispy backend, see offscreen.use_headless
+        """
+        if mode not in EXTRACT:
+            raise ValueError("Drawing mode = " + mode + " not supported")
+        use_headless(backend)
+        app.Canvas.__init__(self, size=size, show=False)
+        self.image_size = tuple(size)
+        self.mode = mode
+        self.face_color = list(face_color)
+        self.edge_color = None if edge_color is None else list(edge_color)
+
+        # shader program and GPU buffers, grow-only across the frames
+        self.tet = TetProgram()
+        self._simplices = None
+
+        # render target
+        self.fbo = gloo.FrameBuffer(
+            color=gloo.RenderBuffer(size[::-1]), depth=gloo.RenderBuffer(size[::-1])
+        )
+        self.tet.set_ratio(size[0] / float(size[1]))
+        self.view()
+
+    def view(self, z=5.0, theta=0.0, phi=0.0):
+        """change the zoom factor and view point"""
+        self.tet.view(z, theta, phi)
+
+    def set_frame(self, points, colors=None, simplices=None):
+        """upload a frame, the topology is kept if simplices is None or the
+        same array as the previous frame"""
+        tet = self.tet
+        tet.set_data(points)
+        if colors is None and tet.colors.size != tet.points.size:
+            colors = np.ones((tet.points.size, 4), dtype=np.float32)
+        faces = edges = None
+        if simplices is not None and simplices is not self._simplices:
+            faces = EXTRACT[self.mode](simplices)
+            if self.edge_color is not None:
+                edges = sim2edge(simplices)
+            self._simplices = simplices
+        tet.set_data(colors=colors, faces=faces, edges=edges)
+
+    def draw_frame(self, capture=None):
+        """draw the current frame into the framebuffer
+
+        capture, if given, is called while the framebuffer is still bound,
+        e.g. capture.Recorder.capture
+        """
+        self.set_current()
+        with self.fbo:
+            gloo.set_viewport(0, 0, *self.image_size)
+            gloo.set_clear_color("white")
+            gloo.clear()
+            self.tet.draw(self.face_color, self.edge_color)
+            if capture is not None:
+                capture()
+
+    def read(self):
+        """read back the framebuffer, height x width x 4 uint8"""
+        return self.fbo.read()
+
+    def render(self, points, colors=None, simplices=None):
+        """render one frame and return the image"""
+        self.set_frame(points, colors, simplices)
+        self.draw_frame()
+        return self.read()
+
+
+def render_batch(frames, sink, renderer=None, buffers=2, **kwargs):
+    """render an iterator of (points, colors, simplices) frames to a sink
+
+    Parameters
+    ----------
+    frames : iterable
+        (points, colors, simplices) tuples, colors and simplices may be
+        None, simplices=None keeps the topology of the previous frame
+    sink : object
+        has write(img) and close(), e.g. PNGSink, NpyStackSink, PipeSink
+    renderer : BatchRenderer
+        reused if given, else created with kwargs (size, mode, backend)
+    buffers : int
+        pixel pack buffers of the asynchronous readback (see capture),
+        0 reads every frame synchronously
+
+    Returns
+    -------
+    int
+        number of frames rendered
+    """
+    if renderer is None:
+        renderer = BatchRenderer(**kwargs)
+    recorder = Recorder(renderer, renderer.fbo, renderer.image_size, sink, buffers)
+    try:
+        for points, colors, simplices in frames:
+            renderer.set_frame(points, colors, simplices)
+            renderer.draw_frame(recorder.capture)
+    finally:
+        recorder.close()
+    return recorder.count
+
+
+# run
+if __name__ == "__main__":
+    from topology import tet_box
+
+    pts, sim = tet_box(8)
+    pts = (pts - 0.5).astype(np.float32)
+
+    def timesteps(n=100):
+        """a breathing box, the topology is sent once"""
+        for i in range(n):
+            scale = 1.0 + 0.2 * np.sin(2 * np.pi * i / n)
+            yield pts * scale, None, sim if i == 0 else None
+
+    render_batch(timesteps(), NpyStackSink("tetplot-frames.npy"), mode="boundary")
@@ -0,0 +1,70 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" recording speed of a rotating scene, synchronous vs PBO readback """
+from __future__ import absolute_import
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from batch import BatchRenderer, NpyStackSink
+from capture import Recorder
+from topology import tet_box
+
+
+class NullSink(object):
+    """drop the images, measures render and readback only"""
+
+    def write(self, img):
+        """nothing"""
+
+    def close(self):
+        """nothing"""
+
+
+def record(renderer, sink, frames, buffers):
+    """rotate the scene as 04-tetrahedron.py, return frames per second"""
+    recorder = Recorder(renderer, renderer.fbo, renderer.image_size, sink, buffers)
+    t = time.perf_counter()
+    for i in range(frames):
+        renderer.view(theta=0.5 * i, phi=0.5 * i)
+        renderer.draw_frame(recorder.capture)
+    recorder.close()
+    return frames / (time.perf_counter() - t)
+
+
+def main():
+    """record the same animation with 0 (sync), 2 and 3 pixel buffers"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tets", type=float, default=1e5)
+    parser.add_argument("--size", type=int, nargs=2, default=(1024, 1024))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+
+    n = max(1, int(round((args.tets / 6.0) ** (1.0 / 3.0))))
+    pts, sim = tet_box(n)
+    pts = (pts - 0.5).astype(np.float32)
+    renderer = BatchRenderer(
+        args.size, "boundary", edge_color=(0, 0, 0, 1), backend=args.backend
+    )
+    colors = np.random.rand(pts.shape[0], 4).astype(np.float32)
+    renderer.set_frame(pts, colors, sim)
+    print("%d tetrahedra, %dx%d pixels" % (sim.shape[0], args.size[0], args.size[1]))
+
+    tmp = tempfile.mkdtemp()
+    print("%8s %12s %12s" % ("buffers", "null [fps]", "npy [fps]"))
+    for buffers in (0, 2, 3):
+        fps_null = record(renderer, NullSink(), args.frames, buffers)
+        filename = os.path.join(tmp, "frames-%d.npy" % buffers)
+        fps_npy = record(renderer, NpyStackSink(filename), args.frames, buffers)
+        os.remove(filename)
+        print("%8d %12.1f %12.1f" % (buffers, fps_null, fps_npy))
+    os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main()
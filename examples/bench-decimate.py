@@ -0,0 +1,92 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" vertices and time of the min/max decimation along a zoom and pan
+
+a random walk of --samples values is reduced by a MinMaxPyramid, then a
+sequence of views (zooming in down to a few hundred samples, and panning)
+is selected for --width pixel columns. the vertices uploaded per view are
+compared to the 2 * width target, and the envelope of every column to
+the min/max of its raw samples (in pixels of --height, 0 expected).
+"""
+from __future__ import absolute_import
+
+import argparse
+import time
+
+import numpy as np
+
+from decimate import MinMaxPyramid, columns
+
+
+def views(n, frames, seed=0):
+    """(i0, i1) of an exponential zoom on a random point, then a pan"""
+    rng = np.random.RandomState(seed)
+    center = rng.uniform(0.2, 0.8) * n
+    spans = np.geomspace(n, 300, frames // 2)
+    for span in spans:
+        yield max(center - span / 2, 0.0), min(center + span / 2, float(n))
+    span = n / 1000.0
+    for shift in np.linspace(0.0, n / 100.0, frames - frames // 2):
+        i0 = min(center + shift, n - span)
+        yield i0, i0 + span
+
+
+def column_error(y, x, values, i0, i1, width):
+    """max difference of the drawn and raw envelopes of the columns"""
+    bounds = columns(i0, i1, width, y.shape[0])
+    bounds = bounds[np.r_[True, np.diff(bounds) > 0]]
+    raw_min = np.minimum.reduceat(y[bounds[0] : bounds[-1]], bounds[:-1] - bounds[0])
+    raw_max = np.maximum.reduceat(y[bounds[0] : bounds[-1]], bounds[:-1] - bounds[0])
+    if x.shape[0] != 2 * raw_min.shape[0]:
+        return np.inf
+    return max(
+        np.abs(values[0::2] - raw_min).max(), np.abs(values[1::2] - raw_max).max()
+    )
+
+
+def main():
+    """build the pyramid, select the views"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=float, default=1e8)
+    parser.add_argument("--factor", type=int, default=4)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--check", type=int, default=10, help="views checked")
+    args = parser.parse_args()
+
+    n = int(args.samples)
+    y = np.cumsum(np.random.normal(0.0, 1.0, n)).astype(np.float32)
+    t = time.perf_counter()
+    pyramid = MinMaxPyramid(y, args.factor)
+    build = time.perf_counter() - t
+    print(
+        "%d samples (%.0f MB), %d levels (%.0f MB), built in %.2f s"
+        % (n, y.nbytes / 1e6, len(pyramid.levels), pyramid.nbytes / 1e6, build)
+    )
+
+    times, counts, errors = [], [], []
+    frames = list(views(n, args.frames))
+    checked = set(np.linspace(0, len(frames) - 1, args.check).astype(int))
+    for f, (i0, i1) in enumerate(frames):
+        if (i1 - i0) / args.width <= 2.0:
+            checked.discard(f)
+        t = time.perf_counter()
+        x, values = pyramid.select(i0, i1, args.width)
+        times.append(time.perf_counter() - t)
+        counts.append(x.shape[0])
+        if f in checked:
+            errors.append(column_error(y, x, values, i0, i1, args.width))
+    scale = args.height / float(y.max() - y.min())
+    print("%24s %10d" % ("vertices, full signal", n))
+    print(
+        "%24s %10d (2 * width = %d)"
+        % ("vertices, max per view", max(counts), 2 * args.width)
+    )
+    print("%24s %10.3f" % ("select [ms], mean", 1e3 * np.mean(times)))
+    print("%24s %10.3f" % ("select [ms], max", 1e3 * np.max(times)))
+    print("%24s %10.2f" % ("envelope error [px]", scale * max(errors)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" image difference and fill rate of the OIT precision modes
+
+the same stack of translucent quads is drawn with every precision of
+WeightedBlendedOIT, the images are compared to the float32 reference
+(the script exits with 1 if a difference exceeds --tolerance) and the
+fill rate is reported in blended fragments per second.
+"""
+from __future__ import absolute_import
+
+import argparse
+import sys
+import time
+
+import numpy as np
+from vispy import scene
+
+from offscreen import use_headless
+from oitref import three_quads
+from wboit import PRECISIONS, WeightedBlendedOIT
+
+
+def quads(layers):
+    """layers squares covering the view, stacked along z, with the corners
+    and the colors of oitref.three_quads"""
+    points, colors, tris, _ = three_quads()
+    z = np.linspace(-1.0, 1.0, layers)
+    vertices = np.tile(points[:4].astype(np.float32), (layers, 1, 1))
+    vertices[:, :, 2] = 10.0 * z[:, np.newaxis]
+    # the two triangles of the first quad
+    faces = tris[[0, 3]].astype(np.uint32)
+    faces = (faces + 4 * np.arange(layers)[:, np.newaxis, np.newaxis]).reshape(-1, 3)
+    colors = np.repeat(colors[::4][np.arange(layers) % 3], 4, axis=0)
+    return vertices.reshape(-1, 3), faces, colors.astype(np.float32)
+
+
+def build(size, layers, precision, mrt):
+    """canvas with the quads drawn by an OIT pass"""
+    canvas = scene.SceneCanvas(size=size, bgcolor=(0.75, 0.75, 0.75, 1.0), show=False)
+    view = canvas.central_widget.add_view()
+    view.camera = "turntable"
+    view.camera.distance = 15.0
+    view.camera.fov = 50
+    vertices, faces, colors = quads(layers)
+    mesh = scene.visuals.Mesh(
+        vertices=vertices, faces=faces, vertex_colors=colors, parent=view.scene
+    )
+    oit = WeightedBlendedOIT(canvas, [mesh], mrt=mrt, precision=precision)
+    return canvas, oit
+
+
+def main():
+    """compare every precision against float32, then time the draws"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, nargs=2, default=(2048, 2048))
+    parser.add_argument("--layers", type=int, default=16)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=8.0)
+    parser.add_argument("--two-pass", action="store_true")
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+
+    use_headless(args.backend)
+    mrt = False if args.two_pass else None
+    reference = None
+    failed = False
+    print("%d layers, %dx%d pixels" % (args.layers, args.size[0], args.size[1]))
+    print(
+        "%12s %9s %10s %10s %14s"
+        % ("precision", "path", "max diff", "mean diff", "Gfragments/s")
+    )
+    for precision in sorted(PRECISIONS, key=lambda p: p != "float32"):
+        canvas, oit = build(args.size, args.layers, precision, mrt)
+        img = oit.render()[..., :3].astype(np.float32)
+        if reference is None:
+            reference = img
+        diff = np.abs(img - reference)
+        failed |= diff.max() > args.tolerance
+
+        canvas.events.draw(region=None)
+        canvas.context.finish()
+        t = time.perf_counter()
+        for _ in range(args.frames):
+            canvas.events.draw(region=None)
+        canvas.context.finish()
+        elapsed = time.perf_counter() - t
+        fragments = args.frames * args.layers * np.prod(canvas.physical_size)
+        print(
+            "%12s %9s %10.1f %10.3f %14.2f"
+            % (precision, oit.path, diff.max(), diff.mean(), fragments / elapsed / 1e9)
+        )
+        canvas.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" per-frame cost of the single pass (MRT) and two-pass OIT paths """
+from __future__ import absolute_import
+
+import argparse
+import time
+
+import numpy as np
+from vispy import scene
+
+from offscreen import use_headless
+from tetplot import TetPlotVisual
+from topology import tet_box
+from wboit import WeightedBlendedOIT, mrt_supported
+
+
+def frame_time(canvas, frames):
+    """mean time of a draw event, synchronized with glFinish"""
+    canvas.events.draw(region=None)
+    canvas.context.finish()
+    t = time.perf_counter()
+    for _ in range(frames):
+        canvas.events.draw(region=None)
+    canvas.context.finish()
+    return (time.perf_counter() - t) / frames
+
+
+def main():
+    """draw a translucent tetrahedral mesh with both paths"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tets", type=float, default=1e6)
+    parser.add_argument("--size", type=int, nargs=2, default=(1024, 1024))
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+
+    use_headless(args.backend)
+    n = max(1, int(round((args.tets / 6.0) ** (1.0 / 3.0))))
+    pts, sim = tet_box(n)
+    pts = (pts - 0.5).astype(np.float32)
+    colors = np.random.rand(pts.shape[0], 4).astype(np.float32)
+    TetPlot = scene.visuals.create_visual_node(TetPlotVisual)
+
+    print("%d tetrahedra, %dx%d pixels" % (sim.shape[0], args.size[0], args.size[1]))
+    print("%10s %12s" % ("path", "frame [ms]"))
+    for mrt in (True, False):
+        canvas = scene.SceneCanvas(size=args.size, show=False)
+        if mrt and not mrt_supported(canvas):
+            print("%10s %12s" % ("mrt", "unsupported"))
+            canvas.close()
+            continue
+        view = canvas.central_widget.add_view()
+        view.camera = "turntable"
+        faces = TetPlot(pts, sim, colors, alpha=0.1, parent=view.scene)
+        oit = WeightedBlendedOIT(canvas, [faces], mrt=mrt)
+        ms = 1e3 * frame_time(canvas, args.frames)
+        print("%10s %12.2f" % (oit.path, ms))
+        canvas.close()
+
+
+if __name__ == "__main__":
+    main()
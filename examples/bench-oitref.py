@@ -0,0 +1,106 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" quality and speed of the OIT weightings, on the CPU reference
+
+the scenes are rasterized by oitref, every OIT method is compared to the
+exact depth-sorted blending (differences in 8 bit levels) and the time
+of the reference itself is reported. --save writes the images as golden
+.npy files to compare GPU renderings against.
+"""
+from __future__ import absolute_import
+
+import argparse
+import time
+
+import numpy as np
+from vispy.util.transforms import perspective, rotate, translate
+
+import oitref
+
+METHODS = ("sorted", "vispy-oit", "commented-oit", "wboit")
+
+
+def stacked(layers, alpha=0.25):
+    """layers squares stacked along z, seen at an angle"""
+    points, colors, tris, matrices = oitref.three_quads(alpha)
+    z = np.linspace(-1.0, 1.0, layers)
+    quad = points[:4] * (1.0, 1.0, 0.0)
+    points = np.concatenate([quad + (0.0, 0.0, 10.0 * zi) for zi in z])
+    colors = np.concatenate(
+        [colors[4 * (i % 3) : 4 * (i % 3) + 4] for i in range(layers)]
+    )
+    tris = (tris[[0, 3]] + 4 * np.arange(layers)[:, np.newaxis, np.newaxis]).reshape(
+        -1, 3
+    )
+    return points, colors, tris, matrices
+
+
+def soup(count, alpha=0.4, seed=0):
+    """random intersecting translucent triangles"""
+    rng = np.random.RandomState(seed)
+    centers = rng.uniform(-8.0, 8.0, (count, 1, 3))
+    points = (centers + rng.normal(0.0, 3.0, (count, 3, 3))).reshape(-1, 3)
+    colors = np.c_[rng.uniform(0.0, 1.0, (3 * count, 3)), np.full(3 * count, alpha)]
+    colors = colors.reshape(count, 3, 4)
+    colors[:] = colors[:, :1]
+    tris = np.arange(3 * count).reshape(-1, 3)
+    matrices = (
+        rotate(20, (1, 0, 0)),
+        translate((0, 0, -40)),
+        perspective(50.0, 1.0, 0.1, 100.0),
+    )
+    return points, colors.reshape(-1, 4), tris, matrices
+
+
+def main():
+    """render the scenes with every method, compare to sorted blending"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, nargs=2, default=(512, 512))
+    parser.add_argument("--layers", type=int, default=16)
+    parser.add_argument("--triangles", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", default=None, help="prefix of golden .npy files")
+    args = parser.parse_args()
+
+    scenes = {
+        "three-quads": oitref.three_quads(),
+        "stacked": stacked(args.layers),
+        "soup": soup(args.triangles),
+    }
+    print("%dx%d pixels" % tuple(args.size))
+    print(
+        "%12s %14s %10s %10s %10s %14s"
+        % ("scene", "method", "max diff", "mean diff", "ms", "Mfragments/s")
+    )
+    for name, (points, colors, tris, matrices) in scenes.items():
+        clip, _ = oitref.to_clip(points, *matrices)
+        fragments = oitref.rasterize(clip, colors[:, :1], tris, args.size)[0].shape[0]
+        reference = None
+        for method in METHODS:
+            elapsed = np.inf
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                img = oitref.render(points, colors, tris, matrices, args.size, method)
+                elapsed = min(elapsed, time.perf_counter() - t)
+            if reference is None:
+                reference = img
+            diff = 255.0 * np.abs(img - reference)
+            print(
+                "%12s %14s %10.1f %10.3f %10.1f %14.2f"
+                % (
+                    name,
+                    method,
+                    diff.max(),
+                    diff.mean(),
+                    1e3 * elapsed,
+                    fragments / elapsed / 1e6,
+                )
+            )
+            if args.save:
+                np.save(
+                    "%s-%s-%s.npy" % (args.save, name, method), img.astype(np.float32)
+                )
+
+
+if __name__ == "__main__":
+    main()
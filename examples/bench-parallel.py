@@ -0,0 +1,51 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" scaling benchmark of the parallel face/edge extraction over 1..N cores """
+from __future__ import absolute_import
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from topology import sim_conv, tet_box
+from topoparallel import parallel_conv
+
+
+def main():
+    """run sim_conv serially and parallel_conv on 1..N workers"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tets", type=float, default=1e7)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    n = max(1, int(round((args.tets / 6.0) ** (1.0 / 3.0))))
+    _, sim = tet_box(n)
+    print("%d tetrahedra, %d cores" % (sim.shape[0], os.cpu_count()))
+
+    workers = [1]
+    while workers[-1] * 2 <= args.workers:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != args.workers:
+        workers.append(args.workers)
+
+    print("%8s %4s %10s %8s" % ("workers", "N", "time [s]", "speedup"))
+    for N in (3, 2):
+        t = time.perf_counter()
+        ref = sim_conv(sim, N)
+        serial = time.perf_counter() - t
+        print("%8s %4d %10.3f %8.2f" % ("serial", N, serial, 1.0))
+        for w in workers:
+            best = np.inf
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                out = parallel_conv(sim, N, workers=w)
+                best = min(best, time.perf_counter() - t)
+            assert np.array_equal(out, ref)
+            print("%8d %4d %10.3f %8.2f" % (w, N, best, serial / best))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" per-frame cost of depth peeling against weighted blended OIT
+
+the three translucent quads of vispy-oit.py and the teapot of
+oit-teapot.py (glumpy geometry, skipped if glumpy is missing) are drawn
+with WeightedBlendedOIT and DepthPeeling. the geometry passes (for the
+peeling, the depth complexity plus the empty peel) and the difference
+of the WBOIT image to the exact one (in 8 bit levels) are reported.
+"""
+from __future__ import absolute_import
+
+import argparse
+import time
+
+import numpy as np
+from vispy import scene
+
+from offscreen import use_headless
+from oitref import three_quads
+from peeling import DepthPeeling
+from wboit import WeightedBlendedOIT
+
+
+def quads():
+    """the scene of vispy-oit.py (see oitref), vertices, faces, colors and
+    distance"""
+    points, colors, tris, _ = three_quads()
+    return (
+        points.astype(np.float32),
+        tris.astype(np.uint32),
+        colors.astype(np.float32),
+        40.0,
+    )
+
+
+def teapot():
+    """the checkered teapot of oit-teapot.py, None without glumpy"""
+    try:
+        from glumpy.geometry import primitives
+    except ImportError:
+        return None
+    vertices, indices = primitives.teapot()
+    u, v = vertices["texcoord"].T
+    checker = (np.floor(8 * u) + np.floor(8 * v)) % 2
+    colors = np.ones((len(vertices), 4), dtype=np.float32)
+    colors[:, :3] = checker[:, np.newaxis]
+    colors[:, 3] = 0.25
+    faces = np.asarray(indices, dtype=np.uint32).reshape(-1, 3)
+    return vertices["position"] * 10, faces, colors, 50.0
+
+
+def build(size, geometry, path, layers):
+    """canvas with the geometry drawn by a transparency pass"""
+    vertices, faces, colors, distance = geometry
+    canvas = scene.SceneCanvas(size=size, bgcolor=(0.75, 0.75, 0.75, 1.0), show=False)
+    view = canvas.central_widget.add_view()
+    view.camera = "turntable"
+    view.camera.distance = distance
+    view.camera.fov = 50
+    view.camera.elevation = 40
+    mesh = scene.visuals.Mesh(
+        vertices=vertices, faces=faces, vertex_colors=colors, parent=view.scene
+    )
+    if path == "peel":
+        return canvas, DepthPeeling(canvas, [mesh], layers=layers)
+    return canvas, WeightedBlendedOIT(canvas, [mesh])
+
+
+def frame_time(canvas, frames):
+    """mean time of a draw event, synchronized with glFinish"""
+    canvas.events.draw(region=None)
+    canvas.context.finish()
+    t = time.perf_counter()
+    for _ in range(frames):
+        canvas.events.draw(region=None)
+    canvas.context.finish()
+    return (time.perf_counter() - t) / frames
+
+
+def main():
+    """time both passes on both scenes"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, nargs=2, default=(1024, 1024))
+    parser.add_argument("--layers", type=int, default=16)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+
+    use_headless(args.backend)
+    scenes = [("three-quads", quads()), ("teapot", teapot())]
+    print("%dx%d pixels, at most %d layers" % (tuple(args.size) + (args.layers,)))
+    print(
+        "%12s %6s %12s %6s %10s %10s"
+        % ("scene", "path", "frame [ms]", "passes", "max diff", "mean diff")
+    )
+    for name, geometry in scenes:
+        if geometry is None:
+            print("%12s %6s" % (name, "skipped, glumpy is not installed"))
+            continue
+        images = {}
+        for path in ("peel", "wboit"):
+            canvas, oit = build(args.size, geometry, path, args.layers)
+            if path == "peel" and not oit.query:
+                print("%12s no occlusion queries, peels are read back" % name)
+            images[path] = oit.render()[..., :3].astype(np.float32)
+            ms = 1e3 * frame_time(canvas, args.frames)
+            passes = oit.peels if path == "peel" else (1 if oit.mrt else 2)
+            diff = np.abs(images[path] - images["peel"])
+            print(
+                "%12s %6s %12.2f %6d %10.1f %10.3f"
+                % (name, path, ms, passes, diff.max(), diff.mean())
+            )
+            canvas.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" throughput of the headless tetplot renderer in images per second """
+from __future__ import absolute_import
+
+import argparse
+import time
+
+import numpy as np
+
+from offscreen import TetRenderer
+from topology import tet_box
+
+
+def main():
+    """render rotating views and a moving mesh, report images/s"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tets", type=float, default=1e5)
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 600))
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--backend", default=None)
+    args = parser.parse_args()
+
+    n = max(1, int(round((args.tets / 6.0) ** (1.0 / 3.0))))
+    pts, sim = tet_box(n)
+    pts = (pts - 0.5).astype(np.float32)
+    renderer = TetRenderer(args.size, backend=args.backend)
+    print("%d tetrahedra, %dx%d pixels" % (sim.shape[0], args.size[0], args.size[1]))
+
+    # first image: compilation and topology extraction
+    t = time.perf_counter()
+    renderer.render(pts, sim, mode="boundary", scalar=pts[:, 2])
+    print("%-24s %10.3f s" % ("first image", time.perf_counter() - t))
+
+    azimuth = np.linspace(0, 360, args.frames, endpoint=False)
+    t = time.perf_counter()
+    for a in azimuth:
+        renderer.render(
+            pts, None, mode="boundary", scalar=pts[:, 2], camera=dict(azimuth=a)
+        )
+    fps = args.frames / (time.perf_counter() - t)
+    print("%-24s %10.1f images/s" % ("rotating camera", fps))
+
+    t = time.perf_counter()
+    for a in azimuth:
+        moved = pts * (1.0 + 0.1 * np.sin(np.radians(a)))
+        renderer.render(moved, None, mode="boundary", scalar=moved[:, 2])
+    fps = args.frames / (time.perf_counter() - t)
+    print("%-24s %10.1f images/s" % ("moving points", fps))
+
+    # vispy default: a new framebuffer per image
+    t = time.perf_counter()
+    for a in azimuth:
+        renderer.set_camera(azimuth=a)
+        renderer.canvas.render()
+    fps = args.frames / (time.perf_counter() - t)
+    print("%-24s %10.1f images/s" % ("SceneCanvas.render", fps))
+    renderer.close()
+
+
+if __name__ == "__main__":
+    main()
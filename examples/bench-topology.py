@@ -0,0 +1,68 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" benchmark face/edge extraction : itertools sim_conv vs topology """
+from __future__ import absolute_import
+
+import argparse
+from itertools import combinations
+import time
+import tracemalloc
+
+import numpy as np
+
+from topology import sim_conv, tet_box
+
+
+def sim_conv_itertools(simplices, N=3):
+    """the original implementation, kept as a reference"""
+    v = [list(combinations(sim, N)) for sim in simplices]
+    t = np.sort(np.array(v).reshape(-1, N), axis=1)
+    # delete duplicated entries
+    t_unique = np.unique(t.view([("", t.dtype)] * N)).view(np.uint32)
+    return t_unique
+
+
+def measure(func, *args):
+    """run func, return (result, seconds, peak MB)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, dt, peak / 2**20
+
+
+def main():
+    """run benchmarks from 10^4 to 10^7 tetrahedra"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1e4, 1e5, 1e6, 1e7])
+    parser.add_argument(
+        "--max-legacy",
+        type=float,
+        default=1e6,
+        help="skip the itertools version above this number of tetrahedra",
+    )
+    args = parser.parse_args()
+
+    print(
+        "%10s %4s %10s %10s %10s %10s"
+        % ("tets", "N", "old [s]", "new [s]", "old MB", "new MB")
+    )
+    for size in args.sizes:
+        n = max(1, int(round((size / 6.0) ** (1.0 / 3.0))))
+        _, sim = tet_box(n)
+        for N in (3, 2):
+            new, t_new, m_new = measure(sim_conv, sim, N)
+            if sim.shape[0] <= args.max_legacy:
+                old, t_old, m_old = measure(sim_conv_itertools, sim, N)
+                assert np.array_equal(old.reshape(new.shape), new)
+                t_old, m_old = "%.3f" % t_old, "%.1f" % m_old
+            else:
+                t_old, m_old = "-", "-"
+            row = (sim.shape[0], N, t_old, t_new, m_old, m_new)
+            print("%10d %4d %10s %10.3f %10s %10.1f" % row)
+
+
+if __name__ == "__main__":
+    main()
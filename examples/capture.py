@@ -0,0 +1,206 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" asynchronous frame capture with pixel pack buffers
+
+glReadPixels into client memory waits for the GPU to finish the frame.
+with a ring of pixel pack buffers (PBO) the read of frame N is only
+queued, its pixels are copied out of the PBO one (or more) frames later,
+while the GPU renders frame N+1. the images are then handed to a writer
+thread, so encoding and disk I/O overlap with rendering too.
+
+PBOs are not part of the OpenGL ES 2 API of vispy.gloo, they are driven
+with PyOpenGL (optional) on the context of the canvas. without PyOpenGL
+the frames are read synchronously with FrameBuffer.read.
+"""
+from __future__ import absolute_import
+
+import ctypes
+import threading
+
+import numpy as np
+
+try:
+    from OpenGL import GL
+except ImportError:
+    GL = None
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class FrameWriter(object):
+    """write images to a sink (see batch) from a background thread"""
+
+    def __init__(self, sink, maxsize=8):
+        """maxsize bounds the number of images waiting in memory"""
+        self.sink = sink
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        """write the images until None is received"""
+        while True:
+            img = self.queue.get()
+            if img is None:
+                break
+            if self.error is None:
+                try:
+                    self.sink.write(img)
+                except Exception as e:  # pylint: disable=broad-except
+                    self.error = e
+
+    def write(self, img):
+        """queue an image, blocks if the writer is maxsize images behind"""
+        if self.error is not None:
+            raise self.error
+        self.queue.put(img)
+
+    def close(self):
+        """wait for the queued images and close the sink"""
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+
+class PixelPackRing(object):
+    """ring of pixel pack buffers, reads frames with a latency of count-1"""
+
+    def __init__(self, size, count=2):
+        """allocate count PBOs of (width, height) RGBA pixels
+
+        the GL context must be current.
+        """
+        if GL is None:
+            raise RuntimeError("pixel pack buffers need PyOpenGL")
+        self.size = tuple(size)
+        self.nbytes = self.size[0] * self.size[1] * 4
+        self.ids = np.atleast_1d(GL.glGenBuffers(count))
+        for pbo in self.ids:
+            GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, pbo)
+            GL.glBufferData(
+                GL.GL_PIXEL_PACK_BUFFER, self.nbytes, None, GL.GL_STREAM_READ
+            )
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+        self.head = 0
+        self.pending = 0
+
+    def _fetch(self, pbo):
+        """copy the pixels out of a PBO, top row first"""
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, pbo)
+        ptr = GL.glMapBuffer(GL.GL_PIXEL_PACK_BUFFER, GL.GL_READ_ONLY)
+        try:
+            raw = (ctypes.c_ubyte * self.nbytes).from_address(ptr)
+            w, h = self.size
+            img = np.frombuffer(raw, np.uint8).reshape(h, w, 4)[::-1].copy()
+        finally:
+            GL.glUnmapBuffer(GL.GL_PIXEL_PACK_BUFFER)
+            GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+        return img
+
+    def _pop(self):
+        """fetch the oldest pending read"""
+        count = self.ids.shape[0]
+        img = self._fetch(self.ids[(self.head - self.pending) % count])
+        self.pending -= 1
+        return img
+
+    def read(self):
+        """queue the read of the bound framebuffer
+
+        Returns
+        -------
+        NDArray or None
+            the image queued count-1 reads ago, None while the ring fills
+        """
+        count = self.ids.shape[0]
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, self.ids[self.head])
+        w, h = self.size
+        GL.glReadPixels(0, 0, w, h, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        GL.glBindBuffer(GL.GL_PIXEL_PACK_BUFFER, 0)
+        self.head = (self.head + 1) % count
+        self.pending += 1
+        if self.pending < count:
+            return None
+        # the ring is full, the oldest read frees its slot for the next one
+        return self._pop()
+
+    def flush(self):
+        """the images still in the ring, oldest first"""
+        images = []
+        while self.pending > 0:
+            images.append(self._pop())
+        return images
+
+    def delete(self):
+        """release the PBOs"""
+        GL.glDeleteBuffers(len(self.ids), self.ids)
+
+
+class Recorder(object):
+    """capture the frames drawn into a framebuffer to a sink
+
+    usage, once per frame after drawing into fbo (still bound)::
+
+        with fbo:
+            draw()
+            recorder.capture()
+
+    the pixels are read through a PixelPackRing when PyOpenGL is
+    available, else synchronously, and written by a FrameWriter.
+    """
+
+    def __init__(self, canvas, fbo, size, sink, buffers=2, maxsize=8):
+        """
+        Parameters
+        ----------
+        canvas : vispy Canvas
+            owns the GL context
+        fbo : gloo.FrameBuffer
+            the framebuffer the frames are drawn into
+        size : (int, int)
+            (width, height) of the framebuffer
+        sink : object
+            has write(img) and close(), see batch
+        buffers : int
+            number of PBOs, frames are read back buffers-1 frames late,
+            buffers=0 (or no PyOpenGL) reads synchronously
+        maxsize : int
+            images waiting for the writer thread
+        """
+        self.canvas = canvas
+        self.fbo = fbo
+        self.writer = FrameWriter(sink, maxsize)
+        self.ring = None
+        if buffers > 0 and GL is not None:
+            canvas.set_current()
+            self.ring = PixelPackRing(size, buffers)
+        self.count = 0
+
+    def capture(self):
+        """read back the current frame, the framebuffer must be bound"""
+        if self.ring is None:
+            img = self.fbo.read()
+        else:
+            # run the queued gloo commands before the raw GL calls
+            self.canvas.context.flush_commands()
+            img = self.ring.read()
+        if img is not None:
+            self.writer.write(img)
+        self.count += 1
+
+    def close(self):
+        """write the frames still in flight and wait for the writer"""
+        if self.ring is not None:
+            self.canvas.set_current()
+            for img in self.ring.flush():
+                self.writer.write(img)
+            self.ring.delete()
+            self.ring = None
+        self.writer.close()
@@ -0,0 +1,200 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" clipping planes and planar slices of tetrahedral meshes
+
+ClipPlane keeps the tetrahedra on the negative side of a plane n.x <= d.
+the faces are extracted once with the ids of the simplices sharing them,
+for a normal the tetrahedra are ranked by the signed distance of their
+centroids and the faces sorted by the lowest rank of their simplices,
+so moving the plane is a binary search, and the visible faces are a
+prefix of the sorted faces.
+
+TetSlicer cuts the mesh by a plane with a vectorized marching tetrahedra,
+only the tetrahedra whose distance range contains the plane are visited.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+
+from topology import SIMPLEX_TABLES, face_runs
+
+# edges of a tetrahedron, local vertex ids
+MT_EDGES = np.array([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+
+
+def _mt_table():
+    """marching tetrahedra, sign mask -> triangles as lists of edge ids"""
+    edge_id = {tuple(e): i for i, e in enumerate(MT_EDGES.tolist())}
+
+    def eid(a, b):
+        return edge_id[(min(a, b), max(a, b))]
+
+    table = {}
+    for mask in range(16):
+        pos = [v for v in range(4) if (mask >> v) & 1]
+        neg = [v for v in range(4) if not (mask >> v) & 1]
+        if len(pos) in (1, 3):
+            v, others = (pos[0], neg) if len(pos) == 1 else (neg[0], pos)
+            table[mask] = [[eid(v, o) for o in others]]
+        elif len(pos) == 2:
+            (a, b), (c, d) = pos, neg
+            quad = [eid(a, c), eid(a, d), eid(b, d), eid(b, c)]
+            table[mask] = [[quad[0], quad[1], quad[2]], [quad[0], quad[2], quad[3]]]
+    return table
+
+
+MT_TABLE = _mt_table()
+
+
+def face_owners(simplices, N=3):
+    """unique N-tuples with the simplices sharing them
+
+    Returns
+    -------
+    t : NDArray of uint32
+        unique (sorted) N-tuples
+    cells : NDArray of uint32
+        ids of the simplices, grouped by tuple
+    start : NDArray of int
+        the simplices of t[i] are cells[start[i]:start[i+1]]
+    """
+    simplices = np.asarray(simplices)
+    M, K = simplices.shape
+    table = SIMPLEX_TABLES.get((K, N))
+    if table is None:
+        raise ValueError("simplex of %d points to %d not supported" % (K, N))
+    t, order, start, _ = face_runs(simplices, table)
+    return t, (order % M).astype(np.uint32), start
+
+
+class ClipPlane(object):
+    """faces of the tetrahedra on the negative side of a moving plane"""
+
+    def __init__(self, points, simplices, N=3, boundary=False):
+        """extract the faces (N=3) or edges (N=2) with their owners
+
+        boundary=True keeps the shell of the clipped region, i.e. the
+        faces with exactly one of their tetrahedra kept, it is computed
+        with a mask instead of a prefix.
+        """
+        self.points = np.asarray(points, dtype=np.float32)
+        self.simplices = np.asarray(simplices)
+        self.boundary = boundary
+        self._faces, self._cells, self._start = face_owners(simplices, N)
+        self._count = np.diff(np.r_[self._start, self._cells.shape[0]])
+        self.set_normal((0.0, 0.0, 1.0))
+
+    def set_normal(self, normal):
+        """rank the tetrahedra along normal and sort the faces"""
+        normal = np.asarray(normal, dtype=np.float32)
+        self.normal = normal / np.linalg.norm(normal)
+        centroid = self.points[self.simplices].mean(axis=1)
+        d = centroid.dot(self.normal)
+        order = np.argsort(d, kind="stable")
+        self.distance = d[order]
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.shape[0])
+
+        r = rank[self._cells]
+        rmin = np.minimum.reduceat(r, self._start)
+        rmax = np.maximum.reduceat(r, self._start)
+        face_order = np.argsort(rmin, kind="stable")
+        self.faces = self._faces[face_order]
+        self.rmin = rmin[face_order]
+        self.rmax = rmax[face_order]
+        self.count = self._count[face_order]
+
+    def kept(self, offset):
+        """number of tetrahedra with n.x <= offset"""
+        return int(np.searchsorted(self.distance, offset, side="right"))
+
+    def prefix(self, offset):
+        """number of faces (sorted) touching a kept tetrahedron"""
+        return int(np.searchsorted(self.rmin, self.kept(offset), side="left"))
+
+    def visible(self, offset):
+        """visible faces, faces[:prefix] or the shell of the kept region"""
+        j = self.prefix(offset)
+        if not self.boundary:
+            return self.faces[:j]
+        k = self.kept(offset)
+        shell = (self.rmax[:j] >= k) | (self.count[:j] == 1)
+        return self.faces[:j][shell]
+
+
+def slice_tets(points, simplices, normal, offset, values=None):
+    """planar slice of tetrahedra by marching tetrahedra
+
+    Parameters
+    ----------
+    points : NDArray of float32
+        N x 3 points coordinates
+    simplices : NDArray of uint32
+        M x 4 tetrahedra
+    normal, offset : the plane n.x = offset
+    values : NDArray
+        N or N x C values on the points, interpolated on the slice
+
+    Returns
+    -------
+    verts : NDArray of float32
+        V x 3 points of the slice, 3 per triangle
+    tris : NDArray of uint32
+        T x 3 triangles
+    vals : NDArray or None
+        interpolated values on verts
+    """
+    points = np.asarray(points, dtype=np.float32)
+    simplices = np.asarray(simplices)
+    s = points.dot(np.asarray(normal, dtype=np.float32)) - offset
+    sv = s[simplices]
+    mask = ((sv > 0) * (1 << np.arange(4))).sum(axis=1)
+
+    verts, vals = [], []
+    for case, tris in MT_TABLE.items():
+        sel = simplices[mask == case]
+        if sel.shape[0] == 0:
+            continue
+        for tri in tris:
+            e = MT_EDGES[tri]
+            a, b = sel[:, e[:, 0]], sel[:, e[:, 1]]
+            sa, sb = s[a], s[b]
+            t = (sa / (sa - sb))[..., np.newaxis]
+            verts.append(points[a] + t * (points[b] - points[a]))
+            if values is not None:
+                va, vb = values[a], values[b]
+                tv = t[..., 0] if va.ndim == 2 else t
+                vals.append(va + tv * (vb - va))
+
+    if not verts:
+        empty = np.empty((0, 3), dtype=np.float32)
+        return empty, np.empty((0, 3), dtype=np.uint32), None
+    verts = np.concatenate(verts).reshape(-1, 3).astype(np.float32)
+    tris = np.arange(verts.shape[0], dtype=np.uint32).reshape(-1, 3)
+    if values is not None:
+        vals = np.concatenate(vals)
+        vals = vals.reshape((verts.shape[0],) + np.shape(values)[1:])
+    else:
+        vals = None
+    return verts, tris, vals
+
+
+class TetSlicer(object):
+    """planar slices along a fixed normal, visiting only the cut tetrahedra"""
+
+    def __init__(self, points, simplices, normal=(0.0, 0.0, 1.0)):
+        """sort the tetrahedra by the lower end of their distance range"""
+        self.points = np.asarray(points, dtype=np.float32)
+        normal = np.asarray(normal, dtype=np.float32)
+        self.normal = normal / np.linalg.norm(normal)
+        d = self.points.dot(self.normal)[simplices]
+        dmin, dmax = d.min(axis=1), d.max(axis=1)
+        order = np.argsort(dmin, kind="stable")
+        self.simplices = np.asarray(simplices)[order]
+        self.dmin, self.dmax = dmin[order], dmax[order]
+
+    def slice(self, offset, values=None):
+        """slice at n.x = offset, see slice_tets"""
+        j = np.searchsorted(self.dmin, offset, side="right")
+        cut = self.simplices[:j][self.dmax[:j] >= offset]
+        return slice_tets(self.points, cut, self.normal, offset, values)
@@ -0,0 +1,121 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" frustum culling of large face sets with a linear BVH
+
+faces are sorted along the Morton (z-order) curve of their centroids and
+grouped in chunks of consecutive faces, every chunk has an axis aligned
+bounding box. each frame the 8 corners of every box are mapped to clip
+coordinates, a chunk is hidden if all its corners lie outside the same
+clipping plane. when the visibility of a chunk changes, the faces of the
+visible chunks are compacted into an index buffer of their own, so the
+hidden chunks are not drawn at all.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+
+
+def _spread_bits(v):
+    """insert two zero bits between the 10 lower bits of v"""
+    v = v.astype(np.uint32) & 0x3FF
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+def morton_codes(xyz):
+    """30 bits Morton codes of N x 3 points, normalized to their box"""
+    lo = xyz.min(axis=0)
+    extent = (xyz.max(axis=0) - lo).max() or 1.0
+    q = np.floor((xyz - lo) / extent * 1023.0)
+    return (
+        (_spread_bits(q[:, 0]) << 2)
+        | (_spread_bits(q[:, 1]) << 1)
+        | _spread_bits(q[:, 2])
+    )
+
+
+class ChunkedBVH(object):
+    """faces in Morton order, grouped in chunks with bounding boxes"""
+
+    def __init__(self, points, faces, chunk_size=4096):
+        """build the hierarchy
+
+        Parameters
+        ----------
+        points : NDArray of float32
+            N x 3 points coordinates
+        faces : NDArray of uint32
+            F x 3 triangles or F x 2 edges
+        chunk_size : int
+            number of faces per chunk
+        """
+        points = np.asarray(points, dtype=np.float32)
+        faces = np.asarray(faces, dtype=np.uint32)
+        centroid = points[faces].mean(axis=1)
+        order = np.argsort(morton_codes(centroid), kind="stable")
+        self.faces = faces[order]
+        self.chunk_size = chunk_size
+        self.starts = np.arange(0, self.faces.shape[0], chunk_size)
+        self.visible = np.ones(self.starts.shape[0], dtype=bool)
+        self.update_points(points)
+
+    @property
+    def num_chunks(self):
+        """number of chunks"""
+        return self.starts.shape[0]
+
+    def update_points(self, points):
+        """recompute the bounding boxes after the points moved"""
+        if self.faces.shape[0] == 0:
+            self.lo = self.hi = np.empty((0, 3), dtype=np.float32)
+            return
+        p = np.asarray(points, dtype=np.float32)[self.faces]
+        self.lo = np.minimum.reduceat(p.min(axis=1), self.starts, axis=0)
+        self.hi = np.maximum.reduceat(p.max(axis=1), self.starts, axis=0)
+
+    def corners(self):
+        """the 8 corners of every box, (8 * num_chunks) x 3"""
+        c = np.empty((8, self.num_chunks, 3), dtype=np.float32)
+        for i in range(8):
+            for axis in range(3):
+                box = self.hi if (i >> axis) & 1 else self.lo
+                c[i, :, axis] = box[:, axis]
+        return c.reshape(-1, 3)
+
+    def cull(self, transform):
+        """visibility of the chunks
+
+        Parameters
+        ----------
+        transform : vispy Transform
+            visual to render (clip) coordinates, its map() returns
+            homogeneous (x, y, z, w)
+
+        Returns
+        -------
+        NDArray of bool
+            True for the chunks that may be visible
+        """
+        if self.num_chunks == 0:
+            return self.visible
+        clip = np.asarray(transform.map(self.corners()))
+        clip = clip.reshape(8, self.num_chunks, 4)
+        x, y, z, w = clip[..., 0], clip[..., 1], clip[..., 2], clip[..., 3]
+        hidden = np.zeros(self.num_chunks, dtype=bool)
+        for c in (x, y, z):
+            hidden |= np.all(c < -w, axis=0) | np.all(c > w, axis=0)
+        return ~hidden
+
+    def visible_faces(self):
+        """faces of the visible chunks, contiguous, in Morton order"""
+        count = np.diff(np.r_[self.starts, self.faces.shape[0]])
+        return self.faces[np.repeat(self.visible, count)]
+
+    def changed(self, visible):
+        """update the visibility, return the ids of the changed chunks"""
+        changed = np.flatnonzero(visible != self.visible)
+        self.visible = visible
+        return changed
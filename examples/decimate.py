@@ -0,0 +1,235 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" min/max decimation pyramid for line plots of millions of samples
+
+a line_strip of 10^7 samples (02-plot.py) sends 10^7 vertices for less
+than 10^4 pixel columns. a MinMaxPyramid reduces the signal once into
+levels of bins of factor^k samples, each bin keeping the min and the max
+of its samples. a view of [i0, i1) drawn on `width` pixels computes the
+exact min and max of the samples of every pixel column from the bins of
+the levels (a range query, at most 2 * (factor - 1) bins per level and
+column), and draws every column as a vertical segment from its min to
+its max, so
+
+    - the envelope of the samples of every column is drawn, as with the
+      full resolution
+    - 2 * (width + 2) vertices at most are uploaded, whatever the zoom
+
+views of less than 2 * width samples use the samples themselves. the
+levels take 2 / (factor - 1) times the memory of the signal (2/3 with
+factor=4), the signal itself is not copied (it may be a np.memmap).
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import app, gloo
+
+from dynbuffer import DynamicBuffer
+from streaming import draw_range
+
+
+class MinMaxPyramid(object):
+    """min and max of the signal over bins of factor^k samples"""
+
+    def __init__(self, y, factor=4):
+        """reduce the signal y (1d array) down to a single bin"""
+        self.y = np.asarray(y)
+        if self.y.ndim != 1:
+            raise ValueError("the signal must be a 1d array")
+        self.factor = int(factor)
+        if self.factor < 2:
+            raise ValueError("factor must be at least 2")
+        # levels[k] = (mins, maxs) of bins of factor^k samples, k >= 1
+        self.levels = [(self.y, self.y)]
+        mins, maxs = self.y, self.y
+        while mins.shape[0] > 1:
+            starts = np.arange(0, mins.shape[0], self.factor)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            self.levels.append((mins, maxs))
+
+    def __len__(self):
+        return self.y.shape[0]
+
+    @property
+    def nbytes(self):
+        """memory of the levels, the signal excluded"""
+        return sum(m.nbytes + x.nbytes for m, x in self.levels[1:])
+
+    def _reduce(self, s, e):
+        """exact min and max of the samples [s, e) for arrays of ranges
+
+        a range is split into the bins of the levels (at most factor - 1
+        bins per level on each side), as in a range query on a tree.
+        """
+        s, e = s.copy(), e.copy()
+        dtype = self.y.dtype
+        if np.issubdtype(dtype, np.integer):
+            top, bottom = np.iinfo(dtype).max, np.iinfo(dtype).min
+        else:
+            top, bottom = np.inf, -np.inf
+        lo = np.full(s.shape, top, dtype=dtype)
+        hi = np.full(s.shape, bottom, dtype=dtype)
+        f = self.factor
+        for mins, maxs in self.levels:
+            if not np.any(s < e):
+                break
+            for _ in range(f - 1):
+                head = (s % f != 0) & (s < e)
+                lo[head] = np.minimum(lo[head], mins[s[head]])
+                hi[head] = np.maximum(hi[head], maxs[s[head]])
+                s[head] += 1
+                tail = (e % f != 0) & (s < e)
+                e[tail] -= 1
+                lo[tail] = np.minimum(lo[tail], mins[e[tail]])
+                hi[tail] = np.maximum(hi[tail], maxs[e[tail]])
+            s, e = s // f, e // f
+        return lo, hi
+
+    def select(self, i0, i1, width):
+        """vertices of the samples [i0, i1) drawn on width pixels
+
+        Returns
+        -------
+        x : NDArray of float64
+            sample index of the vertices
+        y : NDArray
+            values of the vertices, min and max of every pixel column
+
+        a column is added on both sides, so the line leaves the view at
+        its borders.
+        """
+        n = len(self)
+        spp = max(i1 - i0, 1.0) / float(width)
+        if spp <= 2.0:
+            # few samples per column, draw them
+            b0 = max(int(np.floor(i0)) - 1, 0)
+            b1 = min(int(np.ceil(i1)) + 1, n)
+            return np.arange(b0, b1, dtype=np.float64), self.y[b0:b1]
+        bounds = columns(i0, i1, width, n)
+        s, e = bounds[:-1], bounds[1:]
+        keep = s < e
+        lo, hi = self._reduce(s[keep], e[keep])
+        x = np.repeat(s[keep].astype(np.float64), 2)
+        y = np.empty(x.shape[0], dtype=self.y.dtype)
+        y[0::2], y[1::2] = lo, hi
+        return x, y
+
+
+def columns(i0, i1, width, n):
+    """first sample of the pixel columns of [i0, i1) on width pixels, and
+    of the columns on both sides, clipped to the n samples"""
+    spp = max(i1 - i0, 1.0) / float(width)
+    bounds = np.ceil(i0 + spp * np.arange(-1, width + 2)).astype(np.int64)
+    return np.clip(bounds, 0, n)
+
+
+vertex = """
+uniform float u_origin;     // x of the first vertex in the view, in samples
+uniform float u_span;       // samples in the view
+uniform vec2 u_yrange;
+attribute float a_x;        // sample index, relative to the first vertex
+attribute float a_y;
+
+void main(void)
+{
+    float x = 2.0 * (a_x + u_origin) / u_span - 1.0;
+    float y = 2.0 * (a_y - u_yrange.x) / (u_yrange.y - u_yrange.x) - 1.0;
+    gl_Position = vec4(x, y, 0.0, 1.0);
+}
+"""
+
+fragment = """
+void main()
+{
+    gl_FragColor = vec4(0.0, 0.0, 0.0, 1.0);
+}
+"""
+
+
+class DecimatedPlot(app.Canvas):
+    """line plot of a long signal, zoom with the wheel and pan by dragging"""
+
+    def __init__(self, y, factor=4, **kwargs):
+        """build the pyramid of y, kwargs are app.Canvas arguments"""
+        kwargs.setdefault("size", (800, 400))
+        kwargs.setdefault("keys", "interactive")
+        app.Canvas.__init__(self, **kwargs)
+        self.pyramid = MinMaxPyramid(y, factor)
+        top = self.pyramid.levels[-1]
+        lo, hi = float(top[0][0]), float(top[1][0])
+        pad = 0.05 * (hi - lo) if hi > lo else 1.0
+        # visible samples [x0, x1)
+        self.xrange = [0.0, float(len(self.pyramid))]
+        self.X = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self.Y = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        # vertices of the view, the buffers may be larger
+        self.uploaded = 0
+        self._selection = None
+        self._origin = 0.0
+
+        self.program = gloo.Program(vert=vertex, frag=fragment)
+        self.program["u_yrange"] = (lo - pad, hi + pad)
+
+    def _select(self):
+        """upload the vertices of the view if it changed"""
+        width = self.physical_size[0]
+        x0, x1 = self.xrange
+        if (x0, x1, width) != self._selection:
+            # the columns move with the view, a few thousand vertices
+            self._selection = (x0, x1, width)
+            x, y = self.pyramid.select(x0, x1, width)
+            # relative x, float32 is exact up to 2^24 samples only
+            self._origin = x[0] if x.shape[0] else 0.0
+            self.uploaded = x.shape[0]
+            if self.X.set(x - self._origin):
+                self.program["a_x"] = self.X.buffer
+            if self.Y.set(y):
+                self.program["a_y"] = self.Y.buffer
+        self.program["u_origin"] = self._origin - x0
+        self.program["u_span"] = x1 - x0
+
+    def on_mouse_wheel(self, event):
+        """zoom around the mouse"""
+        x0, x1 = self.xrange
+        f = event.pos[0] / float(self.size[0])
+        c = x0 + f * (x1 - x0)
+        span = (x1 - x0) * np.exp(-0.2 * event.delta[1])
+        span = min(max(span, 16.0), float(len(self.pyramid)))
+        self._set_xrange(c - f * span, c + (1 - f) * span)
+
+    def on_mouse_move(self, event):
+        """pan with the left button"""
+        if not event.is_dragging or event.last_event is None:
+            return
+        dx = event.pos[0] - event.last_event.pos[0]
+        x0, x1 = self.xrange
+        shift = -dx / float(self.size[0]) * (x1 - x0)
+        self._set_xrange(x0 + shift, x1 + shift)
+
+    def _set_xrange(self, x0, x1):
+        """clamp the view to the signal and redraw"""
+        n, span = float(len(self.pyramid)), x1 - x0
+        x0 = min(max(x0, 0.0), n - span)
+        self.xrange = [x0, x0 + span]
+        self.update()
+
+    def on_resize(self, event):
+        """use the entire canvas"""
+        gloo.set_viewport(0, 0, *event.physical_size)
+
+    def on_draw(self, event):
+        """draw the envelope of the view"""
+        gloo.set_clear_color((1.0, 1.0, 1.0, 1.0))
+        gloo.clear()
+        self._select()
+        draw_range(self, self.program, "line_strip", 0, self.uploaded)
+
+
+# run
+if __name__ == "__main__":
+    N = 10**7
+    signal = np.cumsum(np.random.normal(0.0, 1.0, N)).astype(np.float32)
+    c = DecimatedPlot(signal)
+    c.show()
+    app.run()
@@ -0,0 +1,174 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" grow-only gloo buffers with dirty tracking
+
+a DynamicBuffer keeps a host copy of what was uploaded, so a new array
+only uploads the rows that changed (one set_subdata over the dirty span),
+and a smaller array reuses the buffer, the tail is filled with `fill`.
+for index buffers fill=0 gives degenerated primitives, which are not drawn.
+
+read-only arrays of the right dtype (a np.memmap opened with mode='r') are
+not copied: the host copy is the array itself until a sub-range is
+patched, and a new buffer is uploaded in chunks of STAGING_BYTES that are
+views of the array, so a recording on disk does not take twice its size
+in memory.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import gloo
+
+# bytes per set_subdata of a new buffer
+STAGING_BYTES = 64 * 2**20
+
+
+def stream(buffer, data, offset=0, chunk=None, copy=False):
+    """upload data to buffer from row offset, chunk (default to
+    STAGING_BYTES) bytes at a time
+
+    with copy=False the chunks are views of data (the upload is deferred,
+    data must not change before the next draw). the rows of an index
+    buffer are flattened, offset counts rows.
+    """
+    n = data.shape[0]
+    if n == 0:
+        return
+    k = int(np.prod(data.shape[1:]))
+    chunk = STAGING_BYTES if chunk is None else chunk
+    rows = max(chunk // max(data[:1].nbytes, 1), 1)
+    flat = isinstance(buffer, gloo.IndexBuffer)
+    for lo in range(0, n, rows):
+        part = data[lo : lo + rows]
+        if flat:
+            buffer.set_subdata(part.ravel(), (offset + lo) * k, copy=copy)
+        else:
+            buffer.set_subdata(part, offset + lo, copy=copy)
+
+
+def as_rows(data, dtype, columns=None):
+    """(n, columns) array of dtype, without a copy if data already is
+
+    data is an array (a np.memmap), its shape is kept and checked against
+    columns if given, or any object of the buffer protocol, raw bytes are
+    read as dtype in rows of columns (which must then be given).
+    """
+    if not isinstance(data, np.ndarray):
+        try:
+            view = memoryview(data)
+        except TypeError:
+            view = None
+        if view is not None and view.format in ("B", "b", "c"):
+            if columns is None:
+                raise ValueError("the columns of a raw buffer must be given")
+            return np.frombuffer(view, dtype=dtype).reshape(-1, columns)
+    data = np.asarray(data, dtype=dtype)
+    if data.ndim != 2 or (columns is not None and data.shape[1] != columns):
+        expected = "n x %d" % columns if columns is not None else "2d"
+        raise ValueError("%s array expected, got %s" % (expected, data.shape))
+    return data
+
+
+class DynamicBuffer(object):
+    """gloo.VertexBuffer or gloo.IndexBuffer reused across updates"""
+
+    def __init__(self, cls=gloo.VertexBuffer, dtype=np.float32, fill=0, growth=1.5):
+        """initialize an empty buffer
+
+        Parameters
+        ----------
+        cls : class
+            gloo.VertexBuffer or gloo.IndexBuffer
+        dtype : numpy dtype
+            data are converted to this type (without copy if possible)
+        fill : scalar
+            value of the unused rows
+        growth : float
+            capacity factor when the buffer has to be reallocated
+        """
+        self.cls = cls
+        self.dtype = dtype
+        self.fill = fill
+        self.growth = growth
+        self.buffer = None
+        self.host = None
+        self.size = 0
+        # host is a read-only array of the caller, copied before a patch
+        self.borrowed = False
+
+    @property
+    def capacity(self):
+        """number of rows allocated on the GPU"""
+        return 0 if self.host is None else self.host.shape[0]
+
+    def _upload(self, rows, offset):
+        """copy rows to host and GPU at row offset"""
+        if rows.shape[0] == 0:
+            return
+        if self.borrowed:
+            self.host = np.array(self.host)
+            self.borrowed = False
+        self.host[offset : offset + rows.shape[0]] = rows
+        stream(self.buffer, rows, offset, copy=True)
+
+    def set(self, data, offset=None):
+        """update the buffer
+
+        Parameters
+        ----------
+        data : NDArray
+            rows of the buffer
+        offset : int
+            if None, data replaces the content of the buffer, else
+            data patches the rows [offset, offset + len(data))
+
+        Returns
+        -------
+        bool
+            True if a new gloo buffer was allocated, it has to be bound
+            to the program again
+        """
+        data = np.ascontiguousarray(data, dtype=self.dtype)
+        n = data.shape[0]
+        if offset is not None:
+            if self.buffer is None or offset + n > self.size:
+                raise ValueError("sub-range update out of the buffer")
+            self._upload(data, offset)
+            return False
+
+        fits = self.buffer is not None and data.shape[1:] == self.host.shape[1:]
+        if not fits or n > self.capacity:
+            # reallocate, grow-only with some slack
+            capacity = n if not fits else max(n, int(self.growth * self.capacity))
+            self.borrowed = capacity == n and not data.flags.writeable
+            if self.borrowed:
+                self.host = data
+            else:
+                shape = (capacity,) + data.shape[1:]
+                self.host = np.full(shape, self.fill, self.dtype)
+                self.host[:n] = data
+            self.size = n
+            # allocate (dtype and size) without data, then fill in chunks
+            self.buffer = self.cls()
+            self.buffer.set_data(self.host[:0])
+            self.buffer.resize_bytes(self.host.nbytes)
+            stream(self.buffer, self.host)
+            return True
+
+        if n == self.size:
+            # upload the span of changed rows only
+            dirty = data != self.host[:n]
+            if dirty.ndim > 1:
+                dirty = dirty.reshape(n, -1).any(axis=1)
+            rows = np.flatnonzero(dirty)
+            if rows.shape[0] > 0:
+                lo, hi = rows[0], rows[-1] + 1
+                self._upload(data[lo:hi], lo)
+            return False
+
+        # reuse the buffer, clear the rows not used anymore
+        if n < self.size:
+            tail = np.full((self.size - n,) + data.shape[1:], self.fill, self.dtype)
+            self._upload(tail, n)
+        self._upload(data, 0)
+        self.size = n
+        return False
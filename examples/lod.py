@@ -0,0 +1,145 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" level-of-detail index buffers by vertex clustering
+
+the points are snapped to a grid, every point is replaced by the first
+point of its cell, and the faces (or edges) that collapse are removed.
+the decimated indices still refer to the original points, so the vertex
+buffers (positions, colors, scalars) are shared by all the levels.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import app
+
+from topology import sim_conv
+
+
+def cluster_decimate(points, faces, lo, size):
+    """decimate faces (or edges) by clustering points on a grid
+
+    Parameters
+    ----------
+    points : NDArray of float32
+        N x 3 points coordinates
+    faces : NDArray of uint32
+        F x 3 triangles or F x 2 edges
+    lo : NDArray
+        origin of the grid
+    size : float
+        size of a grid cell
+
+    Returns
+    -------
+    NDArray of uint32
+        the unique non-degenerated faces after clustering
+    """
+    g = np.floor((points - lo) / size).astype(np.int64)
+    dims = g.max(axis=0) + 1
+    cid = (g[:, 0] * dims[1] + g[:, 1]) * dims[2] + g[:, 2]
+
+    # representative point of every cluster : the first one
+    _, first, inverse = np.unique(cid, return_index=True, return_inverse=True)
+    rep = first[inverse.ravel()].astype(np.uint32)
+
+    f = rep[faces]
+    keep = f[:, 0] != f[:, 1]
+    for j in range(2, f.shape[1]):
+        keep &= (f[:, j] != f[:, j - 1]) & (f[:, j] != f[:, 0])
+    f = f[keep]
+    if f.shape[0] == 0:
+        return f
+    return sim_conv(f, f.shape[1])
+
+
+def lod_levels(points, faces, min_faces=1024, ratio=0.5):
+    """hierarchy of decimated faces, level 0 is the full resolution
+
+    the grid is halved level after level (cascaded from the previous
+    level), a level is kept if it has less than ratio times the faces of
+    the previous one, it stops below min_faces.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    levels = [np.asarray(faces, dtype=np.uint32)]
+    if levels[0].shape[0] <= min_faces:
+        return levels
+
+    lo = points.min(axis=0)
+    extent = float((points.max(axis=0) - lo).max()) or 1.0
+    # a closed surface of F faces has about sqrt(F) points across
+    cells = 2 ** int(np.ceil(np.log2(np.sqrt(levels[0].shape[0]))))
+    faces = levels[0]
+    while cells >= 2 and levels[-1].shape[0] > min_faces:
+        faces = cluster_decimate(points, faces, lo, extent / cells)
+        if faces.shape[0] <= ratio * levels[-1].shape[0]:
+            levels.append(faces)
+        cells //= 2
+    return levels
+
+
+def select_level(sizes, budget):
+    """the finest level with at most budget faces (the coarsest otherwise)
+
+    sizes is the number of faces of every level, see lod_levels.
+    """
+    for i, size in enumerate(sizes):
+        if size <= budget:
+            return i
+    return len(sizes) - 1
+
+
+class InteractiveLOD(object):
+    """draw coarse levels while the camera moves, restore when idle
+
+    the visuals must implement set_lod(coarse), e.g. TetPlotVisual
+    built with lod_budget.
+    """
+
+    def __init__(self, view, visuals, idle=0.3):
+        """attach to a ViewBox
+
+        Parameters
+        ----------
+        view : ViewBox
+            the camera of this view is watched
+        visuals : list
+            visuals switching between their levels
+        idle : float
+            seconds without camera motion before the full resolution
+            is restored
+        """
+        self.visuals = list(visuals)
+        self.coarse = False
+        self.timer = app.Timer(idle, connect=self.on_idle, iterations=1, start=False)
+        # the camera may replace the scene transform (a new camera, or
+        # _set_scene_transform), follow the transform of the scene node
+        self.scene = view.scene
+        self._transform = None
+        self.scene.events.transform_change.connect(self.on_transform)
+        self.on_transform(None)
+
+    def on_transform(self, event):
+        """watch the current scene transform, a new one is a motion"""
+        tr = self.scene.transform
+        if tr is self._transform:
+            return
+        if self._transform is not None:
+            self._transform.changed.disconnect(self.on_motion)
+            self.on_motion(event)
+        self._transform = tr
+        tr.changed.connect(self.on_motion)
+
+    def on_motion(self, event):
+        """camera moved, draw the coarse level and restart the idle timer"""
+        if not self.coarse:
+            self.coarse = True
+            for v in self.visuals:
+                v.set_lod(True)
+        self.timer.stop()
+        self.timer.start()
+
+    def on_idle(self, event):
+        """camera idle, draw the full resolution"""
+        self.coarse = False
+        for v in self.visuals:
+            v.set_lod(False)
@@ -0,0 +1,246 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" headless rendering of tetplots to arrays, PNG or NPY files
+
+the canvas is never shown, the scene is drawn into a framebuffer and read
+back, so it runs on GPU-less servers with the offscreen backends of vispy,
+'egl' (headless driver) or 'osmesa' (software rasterizer).
+
+a TetRenderer keeps one canvas (one GL context), one framebuffer per
+image size and one TetPlot node per drawing configuration. rendering a
+new mesh only updates the buffers of the nodes (see dynbuffer), the
+shaders are compiled once.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+import vispy
+from vispy import gloo, scene
+from vispy.app import _default_app
+from vispy.io import write_png
+
+from tetplot import TetPlotVisual
+
+# offscreen vispy backends, tried in this order
+HEADLESS_BACKENDS = ("egl", "osmesa")
+
+
+def use_headless(backend=None):
+    """select an offscreen backend, the first available one by default
+
+    returns the name of the backend, if an application backend was
+    already selected it is kept (vispy selects a backend only once) and
+    its name is returned, whatever backend is asked for.
+    """
+    current = _default_app.default_app
+    if current is not None:
+        return current.backend_name
+    names = HEADLESS_BACKENDS if backend is None else (backend,)
+    errors = []
+    for name in names:
+        try:
+            vispy.use(app=name)
+            return name
+        except (RuntimeError, ImportError, OSError) as e:
+            errors.append("%s: %s" % (name, e))
+    raise RuntimeError("no headless backend available (%s)" % "; ".join(errors))
+
+
+def save_image(filename, img):
+    """write an image to .npy (raw array) or .png"""
+    if filename.endswith(".npy"):
+        np.save(filename, img)
+    else:
+        write_png(filename, img)
+
+
+class TetRenderer(object):
+    """reusable offscreen canvas for tetplots"""
+
+    def __init__(self, size=(800, 600), bgcolor="white", backend=None):
+        """create the GL context
+
+        Parameters
+        ----------
+        size : (int, int)
+            default (width, height) of the images
+        bgcolor : color
+            background color
+        backend : str
+            vispy backend, default to the first headless one available,
+            see use_headless
+        """
+        use_headless(backend)
+        self.size = tuple(size)
+        self.bgcolor = bgcolor
+        self.canvas = scene.SceneCanvas(size=self.size, bgcolor=bgcolor, show=False)
+        self.view = self.canvas.central_widget.add_view()
+        self.view.camera = "turntable"
+        self.set_camera(fov=50, distance=5)
+        self._TetPlot = scene.visuals.create_visual_node(TetPlotVisual)
+        self._nodes = {}
+        self._cmaps = {}
+        self._fbo = None
+        self._fbo_size = None
+
+    def set_camera(self, **kwargs):
+        """set attributes of the turntable camera (azimuth, elevation,
+        distance, fov, center, scale_factor)"""
+        for key, value in kwargs.items():
+            setattr(self.view.camera, key, value)
+
+    def _draw(self, key, points, simplices, vertex_color, scalar=None, **kwargs):
+        """update (or create at first use) the node of a configuration"""
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._TetPlot(
+                points,
+                simplices,
+                vertex_color,
+                scalar=scalar,
+                parent=self.view.scene,
+                **kwargs
+            )
+            self._nodes[key] = node
+        else:
+            node.set_data(points, simplices, vertex_color, scalar=scalar)
+        node.visible = True
+        return node
+
+    def _framebuffer(self, size):
+        """framebuffer of (width, height), reallocated if the size changed"""
+        if self._fbo is None or self._fbo_size != size:
+            self._fbo = gloo.FrameBuffer(
+                color=gloo.RenderBuffer(size[::-1]),
+                depth=gloo.RenderBuffer(size[::-1]),
+            )
+            self._fbo_size = size
+            # the camera aspect follows the canvas
+            self.canvas.size = size
+        return self._fbo
+
+    def render(
+        self,
+        points,
+        simplices,
+        vertex_color=None,
+        edge_color=None,
+        alpha=1.0,
+        mode="triangles",
+        scalar=None,
+        cmap="viridis",
+        clim=None,
+        size=None,
+        camera=None,
+        filename=None,
+    ):
+        """render a tetplot, see tetplot.tetplot for the arguments
+
+        simplices=None keeps the topology of the previous call with the
+        same configuration (mode, coloring, edges), i.e. only the points
+        and colors of a time series are uploaded.
+
+        Parameters
+        ----------
+        size : (int, int)
+            (width, height) of the image, default to the renderer size
+        camera : dict
+            attributes of the turntable camera, see set_camera
+        filename : str
+            if given, the image is also saved to .png or .npy
+
+        Returns
+        -------
+        NDArray of uint8
+            height x width x 4 RGBA image
+        """
+        if camera is not None:
+            self.set_camera(**camera)
+        color_by = "vertex" if scalar is None else "scalar"
+        if vertex_color is None and scalar is None:
+            vertex_color = np.ones((len(points), 4), dtype=np.float32)
+
+        key = (mode, color_by)
+        for node in self._nodes.values():
+            node.visible = False
+
+        faces = self._draw(
+            key,
+            points,
+            simplices,
+            vertex_color,
+            scalar,
+            mode=mode,
+            cmap=cmap,
+            clim=clim,
+        )
+        faces.set_color(None, alpha)
+        if scalar is not None:
+            if self._cmaps.get(key) != cmap:
+                faces.set_cmap(cmap)
+                self._cmaps[key] = cmap
+            if clim is None:
+                clim = (float(np.min(scalar)), float(np.max(scalar)))
+            faces.set_clim(clim)
+
+        if edge_color is not None:
+            if vertex_color is None:
+                vertex_color = np.ones((len(points), 4), dtype=np.float32)
+            edges = self._draw(
+                ("lines", "edges"), points, simplices, vertex_color, mode="lines"
+            )
+            edges.set_color(edge_color, alpha)
+
+        size = self.size if size is None else tuple(size)
+        fbo = self._framebuffer(size)
+        self.canvas.set_current()
+        self.canvas.push_fbo(fbo, (0, 0), size)
+        try:
+            self.canvas.context.clear(color=self.bgcolor, depth=True)
+            self.canvas.draw_visual(self.canvas.scene)
+            img = fbo.read()
+        finally:
+            self.canvas.pop_fbo()
+
+        if filename is not None:
+            save_image(filename, img)
+        return img
+
+    def close(self):
+        """release the GL context"""
+        self.canvas.close()
+
+
+# the renderer shared by all the calls of render_tetplot
+_renderer = None
+
+
+def render_tetplot(points, simplices, size=(800, 600), camera=None, **kwargs):
+    """render a tetplot offscreen, returns an RGBA image
+
+    all the calls share one TetRenderer (one GL context), see
+    TetRenderer.render for the arguments. filename='out.png' also
+    writes the image.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = TetRenderer(size)
+    return _renderer.render(points, simplices, size=size, camera=camera, **kwargs)
+
+
+# run
+if __name__ == "__main__":
+    from topology import tet_box
+
+    pts, sim = tet_box(8)
+    pts = pts - 0.5
+    for i, azimuth in enumerate(range(0, 360, 45)):
+        render_tetplot(
+            pts,
+            sim if i == 0 else None,
+            scalar=pts[:, 2],
+            mode="boundary",
+            edge_color=[0.2, 0.2, 1.0, 1.0],
+            camera=dict(azimuth=azimuth, elevation=30),
+            filename="tetplot-%03d.png" % azimuth,
+        )
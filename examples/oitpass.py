@@ -0,0 +1,102 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" base of the transparency passes of a SceneCanvas
+
+WeightedBlendedOIT (see wboit) and DepthPeeling (see peeling) draw their
+visuals after the scene: at the start of the draw event the visuals are
+hidden from the scene draw, at its end they are shown again and drawn by
+the pass. a pass attaches one filter per visual, returned by _filter, and
+implements the draw in on_draw.
+"""
+from __future__ import absolute_import
+
+from vispy import gloo
+
+from rendertarget import default_pool
+
+
+class OITPass(object):
+    """visuals drawn after the scene of a canvas, with a filter each"""
+
+    def __init__(self, canvas, pool=None):
+        """
+        Parameters
+        ----------
+        canvas : SceneCanvas
+            the pass runs after the scene at every draw event
+        pool : RenderTargetPool
+            the render targets are taken from this pool at every draw,
+            default to rendertarget.default_pool
+        """
+        self.canvas = canvas
+        self.pool = default_pool if pool is None else pool
+        self.nodes = []
+        self._filters = {}
+        self._visible = {}
+        canvas.events.draw.connect(self.on_draw_start, position="first")
+        canvas.events.draw.connect(self.on_draw, position="last")
+
+    def _filter(self):
+        """a new filter for a node added to the pass"""
+        raise NotImplementedError
+
+    def add(self, node):
+        """draw a visual node with this pass"""
+        filt = self._filter()
+        node.attach(filt)
+        self._filters[node] = filt
+        self.nodes.append(node)
+        self.canvas.update()
+
+    def remove(self, node):
+        """draw a visual node as usual again"""
+        node.detach(self._filters.pop(node))
+        self.nodes.remove(node)
+        self.canvas.update()
+
+    def on_draw_start(self, event):
+        """hide the visuals of the pass from the scene draw, without update()"""
+        for node in self.nodes:
+            self._visible[node] = node.visible
+            node._visible = False  # pylint: disable=protected-access
+
+    def _show(self):
+        """show the visuals again, True if any of them is visible"""
+        for node in self.nodes:
+            node._visible = self._visible.get(node, True)  # pylint: disable=W0212
+        return any(node.visible for node in self.nodes)
+
+    def _draw_nodes(self, setup, **state):
+        """draw the visible nodes with the gl state, setup(filter) first
+
+        the state of a node is restored after its draw.
+        """
+        for node in self.nodes:
+            if not node.visible:
+                continue
+            with node.set_gl_state(**state):
+                setup(self._filters[node])
+                node.draw()
+
+    def render(self):
+        """draw the scene with this pass offscreen, returns an RGBA image
+
+        SceneCanvas.render does not emit the draw event the pass runs on.
+        """
+        canvas = self.canvas
+        size = tuple(canvas.physical_size)
+        canvas.set_current()
+        fbo = gloo.FrameBuffer(
+            color=gloo.RenderBuffer(size[::-1]), depth=gloo.RenderBuffer(size[::-1])
+        )
+        canvas.push_fbo(fbo, (0, 0), canvas.size)
+        try:
+            canvas.events.draw(region=None)
+            img = fbo.read()
+        finally:
+            canvas.pop_fbo()
+        return img
+
+    def on_draw(self, event):
+        """draw the visuals of the pass over the scene"""
+        raise NotImplementedError
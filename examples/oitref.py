@@ -0,0 +1,299 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" NumPy reference of weighted blended OIT, for CPU validation
+
+a vectorized software rasterizer produces the fragments of triangles
+(pixel, window depth, perspective-correct attributes), then the
+accumulation, revealage and composition of the OIT examples are
+reproduced with the exact math of their shaders and blend functions:
+
+'vispy-oit' : vispy-oit.py, two passes
+    w = (a + 0.01)^2 * clamp(0.3 / (1e-5 + (z / 200)^4), 1e-2, 3e3)
+    accum = sum(rgb * w, a)        (ONE, ONE)
+    reveal = prod(1 - a * w)       (ZERO, ONE_MINUS_SRC_COLOR)
+    out = accum.rgb / clamp(reveal, 1e-4, 5e4) over bg with alpha
+    r = accum.a (SRC_ALPHA, ONE_MINUS_SRC_ALPHA), discarded if r >= 1
+'commented-oit' : commented-oit.py and oit.py, one MRT pass
+    w = (a + 0.01)^4 + clamp(0.3 / (1e-5 + (z / 200)^4), 1e-2, 3e3)
+    accum = (sum(rgb * a * w), prod(1 - a))   (ONE, ONE, ZERO, 1 - SRC_ALPHA)
+    reveal = sum(a * w)
+    out = accum.rgb / clamp(reveal, 1e-4, 5e4) with r = accum.a blended
+    (ONE_MINUS_SRC_ALPHA, SRC_ALPHA), discarded if r >= 1
+'wboit' : wboit.WeightedBlendedOIT (two-pass), z is the window depth
+    w = a * clamp(wmax * (1 - z)^3, 1e-2, wmax)
+    accum = sum((rgb * a, a) * w), reveal = prod(1 - a)
+    out = accum.rgb / clamp(accum.a, 1e-4, 5e4) with r = reveal blended
+    (ONE_MINUS_SRC_ALPHA, SRC_ALPHA), discarded if r >= 1
+
+z is the eye depth -(view * model * p).z unless noted. the targets are
+float (unclamped), the composed color is clamped to [0, 1] as written to
+the unorm window. the exact result is the depth-sorted 'over' blending
+of the fragments (sorted_blend). images are float RGB arrays in [0, 1],
+top row first.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+
+# background of the OIT examples
+C0 = (0.75, 0.75, 0.75)
+
+
+def to_clip(points, model, view, projection):
+    """clip coordinates and eye depth of N x 3 points
+
+    the matrices are the row-major vispy.util.transforms ones, i.e. the
+    shader computes u_projection * u_view * u_model * p.
+    """
+    p = np.c_[points, np.ones(points.shape[0])]
+    eye = p.dot(model).dot(view)
+    return eye.dot(projection), -eye[:, 2]
+
+
+def rasterize(clip, attrs, tris, size, chunk=1 << 22):
+    """fragments of triangles, sampled at the pixel centers
+
+    Parameters
+    ----------
+    clip : NDArray
+        N x 4 clip coordinates of the vertices, triangles with a vertex
+        behind the eye (w <= 0) are dropped, the other ones are clipped
+        by the viewport and the depth range
+    attrs : NDArray
+        N x K vertex attributes, interpolated with perspective correction
+    tris : NDArray
+        M x 3 triangles
+    size : (int, int)
+        (width, height) of the viewport
+    chunk : int
+        candidate pixels processed at once, bounds the memory
+
+    Returns
+    -------
+    pix : NDArray of int64
+        flat pixel index y * width + x, y from the bottom (GL convention)
+    z : NDArray of float64
+        window depth in [0, 1]
+    values : NDArray
+        F x K interpolated attributes
+    tri : NDArray of int64
+        triangle of every fragment
+
+    pixels on a shared edge belong to one triangle (top-left rule).
+    """
+    W, H = size
+    clip = np.asarray(clip, dtype=np.float64)
+    attrs = np.asarray(attrs, dtype=np.float64)
+    tris = np.asarray(tris, dtype=np.int64)
+    tri_id = np.flatnonzero(np.all(clip[tris, 3] > 0, axis=1))
+    tris = tris[tri_id]
+
+    inv_w = 1.0 / clip[:, 3]
+    ndc = clip[:, :3] * inv_w[:, np.newaxis]
+    win = np.c_[(ndc[:, 0] + 1.0) * 0.5 * W, (ndc[:, 1] + 1.0) * 0.5 * H]
+    zwin = (ndc[:, 2] + 1.0) * 0.5
+
+    # counter-clockwise triangles, the degenerated ones are dropped
+    v = win[tris]
+    area = (v[:, 1, 0] - v[:, 0, 0]) * (v[:, 2, 1] - v[:, 0, 1]) - (
+        v[:, 2, 0] - v[:, 0, 0]
+    ) * (v[:, 1, 1] - v[:, 0, 1])
+    keep = area != 0
+    tris, tri_id, area = tris[keep], tri_id[keep], area[keep]
+    flip = area < 0
+    tris[flip] = tris[flip][:, [0, 2, 1]]
+    area = np.abs(area)
+
+    # edge i goes from vertex i+1 to i+2: (dx, dy, ax, ay) per triangle,
+    # lambda_i is the weight of the vertex opposite edge i
+    a, b = win[tris[:, [1, 2, 0]]], win[tris[:, [2, 0, 1]]]
+    edges = np.concatenate([b - a, a], axis=2)
+    top_left = (edges[..., 1] < 0) | ((edges[..., 1] == 0) & (edges[..., 0] < 0))
+
+    # rows of pixel centers y + 0.5 crossing the triangles
+    v = win[tris]
+    x0 = np.clip(np.ceil(v[..., 0].min(axis=1) - 0.5), 0, W)
+    x1 = np.clip(np.floor(v[..., 0].max(axis=1) - 0.5) + 1, 0, W)
+    y0 = np.clip(np.ceil(v[..., 1].min(axis=1) - 0.5), 0, H).astype(np.int64)
+    y1 = np.clip(np.floor(v[..., 1].max(axis=1) - 0.5) + 1, 0, H).astype(np.int64)
+    rows = np.maximum(y1 - y0, 0)
+    t = np.repeat(np.arange(tris.shape[0]), rows)
+    py = np.arange(t.shape[0]) - np.repeat(np.cumsum(rows) - rows, rows) + y0[t] + 0.5
+
+    # span of every row, widened by a pixel, the exact test is done below
+    lo, hi = x0[t], x1[t]
+    for i in range(3):
+        dx, dy, ax, ay = edges[t, i].T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xc = ax + dx * (py - ay) / dy
+        lo = np.where(dy < 0, np.maximum(lo, np.floor(xc - 0.5)), lo)
+        hi = np.where(dy > 0, np.minimum(hi, np.floor(xc - 0.5) + 2), hi)
+    lo = lo.astype(np.int64)
+    count = np.maximum(hi.astype(np.int64) - lo, 0)
+
+    out = ([np.empty(0, np.int64)], [np.empty(0)], [np.empty((0, attrs.shape[1]))])
+    out += ([np.empty(0, np.int64)],)
+    start = np.r_[0, np.cumsum(count)]
+    r0 = 0
+    while r0 < t.shape[0]:
+        # a run of rows with at most chunk candidate pixels
+        r1 = max(r0 + 1, np.searchsorted(start, start[r0] + chunk, "right") - 1)
+        r1 = min(r1, t.shape[0])
+        n = count[r0:r1]
+        k = np.repeat(np.arange(r0, r1), n)
+        c = t[k]
+        px = lo[k] + np.arange(k.shape[0]) - np.repeat(start[r0:r1] - start[r0], n)
+        px = px + 0.5
+        cy = py[k]
+
+        lam = np.empty((3, c.shape[0]))
+        inside = np.ones(c.shape[0], dtype=bool)
+        for i in range(3):
+            dx, dy, ax, ay = edges[c, i].T
+            e = dx * (cy - ay) - dy * (px - ax)
+            inside &= (e > 0) | ((e == 0) & top_left[c, i])
+            lam[i] = e
+        # window depth is linear in screen space, and clipped to [0, 1]
+        z = np.einsum("it,ti->t", lam, zwin[tris[c]]) / area[c]
+        inside &= (z >= 0.0) & (z <= 1.0)
+        c, lam = c[inside], lam[:, inside] / area[c[inside]]
+        px, cy = px[inside], cy[inside]
+
+        # perspective-correct attributes
+        vert = tris[c]
+        pw = lam.T * inv_w[vert]
+        pw /= pw.sum(axis=1)[:, np.newaxis]
+        out[0].append((cy - 0.5).astype(np.int64) * W + (px - 0.5).astype(np.int64))
+        out[1].append(z[inside])
+        out[2].append(np.einsum("ti,tik->tk", pw, attrs[vert]))
+        out[3].append(c)
+        r0 = r1
+    pix, z, values, tri = (np.concatenate(o) for o in out)
+    return pix, z, values, tri_id[tri]
+
+
+def _group(pix, *arrays):
+    """sort the fragments by pixel, returns the sorted arrays and starts"""
+    order = np.argsort(pix, kind="stable")
+    pix = pix[order]
+    start = np.flatnonzero(np.diff(pix, prepend=-1))
+    return (pix[start], start) + tuple(a[order] for a in arrays)
+
+
+def _image(pixels, rgb, size, bg=C0):
+    """RGB image from the colors of some pixels, the others are bg"""
+    W, H = size
+    img = np.empty((H * W, 3))
+    img[:] = bg
+    img[pixels] = rgb
+    return img.reshape(H, W, 3)[::-1]
+
+
+def weight(method, a, z, wmax=3e3):
+    """weights of the fragments, see the module docstring"""
+    if method == "vispy-oit":
+        return (a + 0.01) ** 2 * np.clip(
+            0.3 / (1e-5 + (np.abs(z) / 200.0) ** 4), 1e-2, 3e3
+        )
+    if method == "commented-oit":
+        return (a + 0.01) ** 4 + np.clip(
+            0.3 / (1e-5 + (np.abs(z) / 200.0) ** 4), 1e-2, 3e3
+        )
+    if method == "wboit":
+        return a * np.clip(wmax * (1.0 - z) ** 3, 1e-2, wmax)
+    raise ValueError("method = " + method + " not supported")
+
+
+def compose(method, pix, zwin, zeye, rgba, size, bg=C0, wmax=3e3):
+    """OIT image of fragments with the math of method
+
+    Parameters
+    ----------
+    pix, zwin : fragments, see rasterize
+    zeye : NDArray
+        eye depth of the fragments
+    rgba : NDArray
+        F x 4 colors of the fragments
+    """
+    pixels, start, zwin, zeye, rgba = _group(pix, zwin, zeye, rgba)
+    rgb, a = rgba[:, :3], rgba[:, 3]
+    z = zwin if method == "wboit" else zeye
+    w = weight(method, a, z, wmax)
+    bg = np.asarray(bg, dtype=np.float64)
+
+    def total(x):
+        return np.add.reduceat(x, start, axis=0)
+
+    def product(x):
+        return np.multiply.reduceat(x, start, axis=0)
+
+    if method == "vispy-oit":
+        accum, r = total(rgb * w[:, np.newaxis]), total(a)
+        reveal = product(1.0 - a * w)
+        color = accum / np.clip(reveal, 1e-4, 5e4)[:, np.newaxis]
+        color, r = np.clip(color, 0.0, 1.0), np.clip(r, 0.0, 1.0)
+        out = color * r[:, np.newaxis] + bg * (1.0 - r[:, np.newaxis])
+    else:
+        # commented-oit and wboit only differ by their weights
+        accum = total(rgb * (a * w)[:, np.newaxis])
+        weights, r = total(a * w), product(1.0 - a)
+        color = accum / np.clip(weights, 1e-4, 5e4)[:, np.newaxis]
+        color = np.clip(color, 0.0, 1.0)
+        out = color * (1.0 - r[:, np.newaxis]) + bg * r[:, np.newaxis]
+    keep = r < 1.0
+    return _image(pixels[keep], out[keep], size, bg)
+
+
+def sorted_blend(pix, zwin, rgba, size, bg=C0):
+    """exact image, the fragments blended back to front (over operator)"""
+    order = np.lexsort((zwin, pix))
+    pix, rgba = pix[order], rgba[order]
+    start = np.flatnonzero(np.diff(pix, prepend=-1))
+    n = np.diff(np.r_[start, pix.shape[0]])
+
+    # front to back, color += T * a * rgb, T *= 1 - a. with the pixels
+    # ordered by decreasing depth complexity, layer k is a prefix of them
+    pixels = pix[start]
+    deepest = np.argsort(-n, kind="stable")
+    depth = np.searchsorted(
+        -n[deepest], -np.arange(1, n.max() + 1 if n.size else 1), "right"
+    )
+    color = np.zeros((start.shape[0], 3))
+    T = np.ones(start.shape[0])
+    for k, m in enumerate(depth):
+        s = deepest[:m]
+        c, a = rgba[start[s] + k, :3], rgba[start[s] + k, 3]
+        color[s] += (T[s] * a)[:, np.newaxis] * c
+        T[s] *= 1.0 - a
+    out = color + T[:, np.newaxis] * np.asarray(bg, dtype=np.float64)
+    return _image(pixels, out, size, bg)
+
+
+def three_quads(alpha=0.25):
+    """the scene of vispy-oit.py : vertices, colors, triangles, matrices"""
+    from vispy.util.transforms import perspective, rotate, translate
+
+    c = [(1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 0.0, 1.0)]
+    corners = [(-1, -1), (-1, +1), (+1, -1), (+1, +1)]
+    pos = [(x, y, z) for z in (-1, 0, 1) for x, y in corners]
+    points = np.array(pos, dtype=np.float64) * 10
+    colors = np.array([c[i // 4] + (alpha,) for i in range(12)])
+    tris = np.array(
+        [(q + 0, q + 1, q + 2) for q in (0, 4, 8)]
+        + [(q + 1, q + 2, q + 3) for q in (0, 4, 8)]
+    )
+    model = np.dot(rotate(30, (0, 0, 1)), rotate(-45, (1, 0, 0)))
+    view = translate((0, 0, -40))
+    projection = perspective(50.0, 1.0, 0.1, 100.0)
+    return points, colors, tris, (model, view, projection)
+
+
+def render(points, colors, tris, matrices, size, method="sorted", **kwargs):
+    """reference image of a scene, method is 'sorted' or an OIT method"""
+    clip, zeye = to_clip(points, *matrices)
+    attrs = np.c_[colors, zeye]
+    pix, zwin, values, _ = rasterize(clip, attrs, tris, size)
+    rgba, zeye = values[:, :4], values[:, 4]
+    if method == "sorted":
+        return sorted_blend(pix, zwin, rgba, size, **kwargs)
+    return compose(method, pix, zwin, zeye, rgba, size, **kwargs)
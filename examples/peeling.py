@@ -0,0 +1,255 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" depth peeling, exact order-independent transparency for vispy scenes
+
+weighted blended OIT (see wboit) approximates the ordering of the
+fragments. depth peeling (Everitt, "Interactive order-independent
+transparency", 2001) is exact: the translucent visuals are drawn once per
+layer with the depth test, every peel keeps the nearest fragments behind
+the layer peeled before (its depth texture is sampled in a filter), and
+the peels are blended front to back into an accumulation target
+
+    C += (1 - A) * a * rgb,  A += (1 - A) * a   (ONE_MINUS_DST_ALPHA, ONE)
+
+which is then composed over the scene (ONE, ONE_MINUS_SRC_ALPHA). the
+cost is one draw of the visuals per layer, so it suits small scenes
+(figures of a few thousand faces), the usage is the one of wboit:
+
+    peel = DepthPeeling(canvas, layers=8)
+    peel.add(mesh)
+
+the peeling stops at the first empty layer, counted with an occlusion
+query (PyOpenGL, optional) or else by reading back the peel (a layer of
+fully transparent fragments then counts as empty). pixels with more than
+`layers` layers miss their farthest fragments. the render targets are
+taken from a RenderTargetPool (see rendertarget), and as with wboit the
+translucent visuals are not occluded by the opaque ones.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import gloo
+from vispy.visuals.filters import Filter
+
+from oitpass import OITPass
+from wboit import vert_compose
+
+try:
+    from OpenGL import GL
+except ImportError:
+    GL = None
+
+# drop the fragments in front of (or on) the previous layer, the depth
+# texture has 24 bits at best, $eps absorbs its quantization
+frag_peel = """
+void depth_peel()
+{
+    // $peel < 0.5 : first layer, or not in the peeling pass
+    if ($peel < 0.5)
+        return;
+    float front = texture2D($front, gl_FragCoord.xy * $texel).r;
+    if (gl_FragCoord.z <= front + $eps)
+        discard;
+}
+"""
+
+# a peel blended under the layers in front of it
+frag_under = """
+uniform sampler2D tex_peel;
+varying vec2 v_texcoord;
+
+void main(void)
+{
+    vec4 color = texture2D(tex_peel, v_texcoord);
+    gl_FragColor = vec4(color.rgb * color.a, color.a);
+}
+"""
+
+# the premultiplied layers over the scene
+frag_compose = """
+uniform sampler2D tex_accumulation;
+varying vec2 v_texcoord;
+
+void main(void)
+{
+    vec4 accum = texture2D(tex_accumulation, v_texcoord);
+    if (accum.a <= 0.0)
+        discard;
+    gl_FragColor = accum;
+}
+"""
+
+
+def queries_supported(canvas):
+    """True if occlusion queries are available (PyOpenGL)"""
+    if GL is None:
+        return False
+    canvas.set_current()
+    try:
+        return int(GL.glGetQueryiv(GL.GL_SAMPLES_PASSED, GL.GL_QUERY_COUNTER_BITS)) > 0
+    except Exception:  # pylint: disable=broad-except
+        return False
+
+
+class PeelFilter(Filter):
+    """discard the fragments of a visual not behind the previous layer"""
+
+    def __init__(self, eps=2.0**-20):
+        Filter.__init__(self, fcode=frag_peel, fhook="post", fpos=100)
+        self.fshader["peel"] = 0.0
+        self.fshader["eps"] = eps
+        self.fshader["texel"] = (1.0, 1.0)
+        # the sampler must be bound even when it is not read
+        self.fshader["front"] = gloo.Texture2D(np.zeros((1, 1), dtype=np.float32))
+
+    def set_front(self, target=None):
+        """peel behind the depth target, None draws all the fragments"""
+        if target is None:
+            self.fshader["peel"] = 0.0
+            return
+        self.fshader["front"] = target.texture
+        self.fshader["texel"] = (1.0 / target.shape[1], 1.0 / target.shape[0])
+        self.fshader["peel"] = 1.0
+
+
+class DepthPeeling(OITPass):
+    """depth peeling transparency pass of a SceneCanvas"""
+
+    def __init__(self, canvas, nodes=(), layers=8, query=None, pool=None):
+        """
+        Parameters
+        ----------
+        canvas : SceneCanvas
+            the pass runs after the scene at every draw event
+        nodes : list
+            visuals to draw with depth peeling, see add
+        layers : int
+            maximum number of peels per frame
+        query : bool
+            stop with occlusion queries, default to the capability of the
+            GL context (see queries_supported), else every peel is read
+            back to count its pixels
+        pool : RenderTargetPool
+            the textures are taken from this pool at every draw, default
+            to rendertarget.default_pool
+        """
+        OITPass.__init__(self, canvas, pool)
+        self.layers = int(layers)
+        self.query = queries_supported(canvas) if query is None else bool(query)
+        self._query = None
+        # layers drawn at the last frame, the empty one included
+        self.peels = 0
+
+        quad = np.array([(-1, -1), (-1, 1), (1, -1), (1, 1)], dtype=np.float32)
+        self.under = gloo.Program(vert_compose, frag_under)
+        self.under["a_position"] = quad
+        self.compose = gloo.Program(vert_compose, frag_compose)
+        self.compose["a_position"] = quad
+        for node in nodes:
+            self.add(node)
+
+    def _filter(self):
+        """depth test against the previous layer"""
+        return PeelFilter()
+
+    def _count(self, draw, size):
+        """run draw(), returns the number of fragments (or pixels) written
+        into the bound framebuffer"""
+        context = self.canvas.context
+        if not self.query:
+            draw()
+            img = gloo.read_pixels((0, 0) + size, alpha=True)
+            return int(np.count_nonzero(img[..., 3]))
+        if self._query is None:
+            self._query = GL.glGenQueries(1)
+        # the queued gloo commands must run inside the query
+        context.flush_commands()
+        GL.glBeginQuery(GL.GL_SAMPLES_PASSED, self._query)
+        draw()
+        context.flush_commands()
+        GL.glEndQuery(GL.GL_SAMPLES_PASSED)
+        return int(GL.glGetQueryObjectuiv(self._query, GL.GL_QUERY_RESULT))
+
+    def _peel(self, color, depth, front):
+        """draw the nearest layer behind front into color, depth into depth"""
+        canvas = self.canvas
+        depth.fbo.color_buffer = color.texture
+        canvas.push_fbo(depth.fbo, (0, 0), canvas.size)
+        canvas.push_viewport((0, 0) + color.size)
+        try:
+            canvas.context.clear(color=(0, 0, 0, 0), depth=True)
+
+            def draw():
+                self._draw_nodes(
+                    lambda filt: filt.set_front(front),
+                    blend=False,
+                    depth_test=True,
+                    depth_func="less",
+                    depth_mask=True,
+                    cull_face=False,
+                )
+
+            return self._count(draw, color.size)
+        finally:
+            canvas.pop_viewport()
+            canvas.pop_fbo()
+            depth.fbo.color_buffer = None
+
+    def _under(self, accum, color):
+        """blend a peel under the accumulated layers"""
+        canvas = self.canvas
+        canvas.push_fbo(accum.fbo, (0, 0), canvas.size)
+        canvas.push_viewport((0, 0) + accum.size)
+        try:
+            gloo.set_state(
+                blend=True,
+                depth_test=False,
+                blend_func=("one_minus_dst_alpha", "one"),
+            )
+            self.under["tex_peel"] = color.texture
+            self.under["u_scale"] = color.scale
+            self.under.draw("triangle_strip")
+        finally:
+            canvas.pop_viewport()
+            canvas.pop_fbo()
+
+    def on_draw(self, event):
+        """peel the layers front to back, compose them over the scene"""
+        self.peels = 0
+        if not self._show():
+            return
+        canvas = self.canvas
+        size = tuple(canvas.physical_size)
+        accum = self.pool.acquire(canvas, size, "rgba32f")
+        color = self.pool.acquire(canvas, size, "rgba16f")
+        depths = [self.pool.acquire(canvas, size, "depth") for _ in range(2)]
+        try:
+            canvas.push_fbo(accum.fbo, (0, 0), canvas.size)
+            canvas.context.clear(color=(0, 0, 0, 0))
+            canvas.pop_fbo()
+
+            # ping-pong the depth textures, a peel samples the previous one
+            front = None
+            for layer in range(self.layers):
+                depth = depths[layer % 2]
+                self.peels += 1
+                if self._peel(color, depth, front) == 0:
+                    break
+                self._under(accum, color)
+                front = depth
+        finally:
+            for filt in self._filters.values():
+                filt.set_front(None)
+            self.pool.release(color)
+            for depth in depths:
+                self.pool.release(depth)
+
+        gloo.set_state(
+            blend=True,
+            depth_test=False,
+            blend_func=("one", "one_minus_src_alpha"),
+        )
+        self.compose["tex_accumulation"] = accum.texture
+        self.compose["u_scale"] = accum.scale
+        self.compose.draw("triangle_strip")
+        self.pool.release(accum)
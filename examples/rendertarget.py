@@ -0,0 +1,168 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" pooled render targets (texture + framebuffer) for offscreen passes
+
+the OIT passes need float textures of the size of the canvas. allocating
+them at every resize event thrashes GPU memory while a window is dragged,
+allocating them once (as vispy-oit.py did) renders at the wrong
+resolution. a RenderTargetPool hands out targets keyed by
+
+    (GL context, size class, format)
+
+the size class is the physical size rounded up to `granularity` pixels,
+a pass renders into the (0, 0, width, height) corner of its target and
+samples it with the texture coordinates scaled by RenderTarget.scale. so
+a target is reallocated only when the size class changes, and released
+targets are reused by the next pass of any canvas sharing the context.
+targets idle for more than max_idle seconds are deleted at the next
+acquire or release, the targets of a deleted context are dropped with it.
+"""
+from __future__ import absolute_import
+
+import time
+import weakref
+
+from vispy import gloo
+
+# name : (channels, format, internalformat, bytes per channel)
+FORMATS = {
+    "rgba32f": (4, "rgba", "rgba32f", 4),
+    "r32f": (1, "luminance", "r32f", 4),
+    "rgba16f": (4, "rgba", "rgba16f", 2),
+    "r16f": (1, "luminance", "r16f", 2),
+    "r8": (1, "luminance", "r8", 1),
+    "depth": (1, "depth_component", "depth_component", 4),
+}
+
+
+class RenderTarget(object):
+    """a color (or depth) texture and its framebuffer"""
+
+    def __init__(self, shared, shape, fmt):
+        """allocate a (height, width) target of format fmt (see FORMATS)
+
+        shared is the GL context the target belongs to, a weak reference
+        is kept, so a pooled target does not keep its context alive.
+        """
+        channels, format, internalformat, _ = FORMATS[fmt]
+        self.shared = weakref.ref(shared)
+        self.key = (shape, fmt)
+        self.shape = shape
+        self.format = fmt
+        self.texture = gloo.Texture2D(
+            shape=shape + (channels,),
+            format=format,
+            internalformat=internalformat,
+            interpolation="nearest",
+        )
+        if format == "depth_component":
+            # a depth texture, another color target may be attached
+            self.fbo = gloo.FrameBuffer(depth=self.texture)
+        else:
+            self.fbo = gloo.FrameBuffer(color=self.texture)
+        self.size = shape[::-1]
+        self.last_used = 0.0
+
+    @property
+    def scale(self):
+        """texture coordinates of the used (width, height) corner"""
+        return (
+            self.size[0] / float(self.shape[1]),
+            self.size[1] / float(self.shape[0]),
+        )
+
+    @property
+    def nbytes(self):
+        """GPU memory, estimated from the internal format"""
+        channels, _, _, depth = FORMATS[self.format]
+        return self.shape[0] * self.shape[1] * channels * depth
+
+    def delete(self):
+        """release the GL objects"""
+        self.fbo.delete()
+        self.texture.delete()
+
+
+class RenderTargetPool(object):
+    """render targets reused across passes, resizes and canvases"""
+
+    def __init__(self, granularity=256, max_idle=5.0):
+        """
+        Parameters
+        ----------
+        granularity : int
+            physical sizes are rounded up to a multiple of granularity
+        max_idle : float
+            seconds after which a released target is deleted
+        """
+        self.granularity = granularity
+        self.max_idle = max_idle
+        # shared context : {(shape, format) : free targets}
+        self._free = weakref.WeakKeyDictionary()
+        # shared context : number of targets allocated
+        self._allocated = weakref.WeakKeyDictionary()
+
+    @property
+    def allocated(self):
+        """number of targets alive, free or in use"""
+        return sum(self._allocated.values())
+
+    def size_class(self, size):
+        """(height, width) allocated for a physical (width, height)"""
+        g = self.granularity
+        w, h = (max(1, int(s)) for s in size)
+        return (-(-h // g) * g, -(-w // g) * g)
+
+    def acquire(self, canvas, size, fmt="rgba32f"):
+        """a target covering the physical size (width, height) of canvas
+
+        the target belongs to the caller until release(target).
+        """
+        self.collect()
+        shape = self.size_class(size)
+        shared = canvas.context.shared
+        free = self._free.get(shared, {}).get((shape, fmt))
+        if free:
+            target = free.pop()
+        else:
+            canvas.set_current()
+            target = RenderTarget(shared, shape, fmt)
+            self._allocated[shared] = self._allocated.get(shared, 0) + 1
+        target.size = (int(size[0]), int(size[1]))
+        return target
+
+    def release(self, target):
+        """give a target back to the pool, and delete the idle ones"""
+        shared = target.shared()
+        if shared is None:
+            # the context is gone, and the GL objects with it
+            return
+        target.last_used = time.monotonic()
+        self._free.setdefault(shared, {}).setdefault(target.key, []).append(target)
+        self.collect()
+
+    def collect(self, max_idle=None):
+        """delete the free targets idle for more than max_idle seconds"""
+        max_idle = self.max_idle if max_idle is None else max_idle
+        now = time.monotonic()
+        for shared, free in list(self._free.items()):
+            for key in list(free):
+                keep = []
+                for target in free[key]:
+                    if now - target.last_used > max_idle:
+                        target.delete()
+                        self._allocated[shared] -= 1
+                    else:
+                        keep.append(target)
+                if keep:
+                    free[key] = keep
+                else:
+                    del free[key]
+
+    def clear(self):
+        """delete all the free targets"""
+        self.collect(max_idle=-1.0)
+
+
+# shared by the passes that are not given a pool
+default_pool = RenderTargetPool()
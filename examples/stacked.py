@@ -0,0 +1,171 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" stacked plot of many channels in a single draw call
+
+02-plot.py draws one signal with one program, n channels would take n
+draw calls (and n uniform updates from python). here the samples of all
+the channels are one vertex buffer, channel after channel
+
+    vertex c * samples + s = sample s of channel c
+
+and a static a_index attribute (GLSL 1.20 has no gl_VertexID) gives the
+channel and the sample of a vertex, hence its x. the offset, scale and
+color of the channels are read from a (2, channels) float texture in the
+vertex shader (256 vec4 uniforms exceed the vertex uniforms of GL 2), so
+the whole plot is one line_strip.
+
+the strip joins the last sample of a channel to the first one of the
+next channel, on that segment the interpolated channel is not an integer
+and its fragments are discarded.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import app, gloo
+
+vertex = """
+uniform sampler2D u_style;  // row 0: color, row 1: (offset, scale, 0, 0)
+uniform float u_channels;
+uniform float u_samples;
+attribute float a_index;    // channel * samples + sample
+attribute float a_value;
+varying vec4 v_color;
+varying float v_channel;
+
+void main(void)
+{
+    // the rounding of the division is corrected on the exact remainder
+    float channel = floor(a_index / u_samples);
+    float i = a_index - channel * u_samples;
+    channel += step(u_samples, i) - step(i, -0.5);
+    i = a_index - channel * u_samples;
+    float u = (channel + 0.5) / u_channels;
+    vec4 style = texture2D(u_style, vec2(u, 0.75));
+    v_color = texture2D(u_style, vec2(u, 0.25));
+    v_channel = channel;
+    float x = 2.0 * i / (u_samples - 1.0) - 1.0;
+    gl_Position = vec4(x, style.x + style.y * a_value, 0.0, 1.0);
+}
+"""
+
+fragment = """
+varying vec4 v_color;
+varying float v_channel;
+
+void main()
+{
+    // the segment between two channels
+    if (abs(v_channel - floor(v_channel + 0.5)) > 1e-3)
+        discard;
+    gl_FragColor = v_color;
+}
+"""
+
+
+class StackedPlot(app.Canvas):
+    """channels of the same length stacked from top to bottom"""
+
+    def __init__(self, data, colors=None, scale=1.0, **kwargs):
+        """
+        Parameters
+        ----------
+        data : NDArray
+            (channels, samples) values
+        colors : NDArray
+            (channels, 4) RGBA, default to black
+        scale : float
+            y scale of the values, 1 spans the height of a channel
+        kwargs : dict
+            app.Canvas arguments
+        """
+        kwargs.setdefault("size", (800, 800))
+        kwargs.setdefault("keys", "interactive")
+        app.Canvas.__init__(self, **kwargs)
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim != 2 or data.shape[1] < 2:
+            raise ValueError("data must be (channels, samples), 2 samples or more")
+        self.channels, self.samples = data.shape
+        if data.size > 2**24:
+            # a_index is a float, exact up to 2^24
+            raise ValueError("at most 2^24 samples in all")
+        self.values = gloo.VertexBuffer(data.ravel())
+        index = np.arange(data.size, dtype=np.float32)
+
+        # the channels share the height of the canvas
+        self.style = np.zeros((2, self.channels, 4), dtype=np.float32)
+        self.style[0, :, 3] = 1.0
+        self.style[1, :, 0] = (
+            1.0 - (2.0 * np.arange(self.channels) + 1.0) / self.channels
+        )
+        self.style[1, :, 1] = scale / float(self.channels)
+        if colors is not None:
+            self.style[0] = colors
+        self.texture = gloo.Texture2D(
+            self.style, internalformat="rgba32f", interpolation="nearest"
+        )
+
+        self.program = gloo.Program(vert=vertex, frag=fragment)
+        self.program["a_index"] = gloo.VertexBuffer(index)
+        self.program["a_value"] = self.values
+        self.program["u_style"] = self.texture
+        self.program["u_channels"] = float(self.channels)
+        self.program["u_samples"] = float(self.samples)
+
+    def set_data(self, data):
+        """replace the (channels, samples) values, one upload"""
+        data = np.asarray(data, dtype=np.float32)
+        if data.shape != (self.channels, self.samples):
+            raise ValueError("data must be (%d, %d)" % (self.channels, self.samples))
+        self.values.set_subdata(data.ravel())
+        self.update()
+
+    def set_channel(self, c, values):
+        """replace the values of channel c"""
+        values = np.asarray(values, dtype=np.float32)
+        if values.shape != (self.samples,):
+            raise ValueError("a channel has %d samples" % self.samples)
+        self.values.set_subdata(values, offset=c * self.samples)
+        self.update()
+
+    def set_style(self, offsets=None, scales=None, colors=None):
+        """y offset, y scale and RGBA color of the channels
+
+        a scalar applies to every channel, a scale of 0 (or a transparent
+        color) hides a channel.
+        """
+        if offsets is not None:
+            self.style[1, :, 0] = offsets
+        if scales is not None:
+            self.style[1, :, 1] = scales
+        if colors is not None:
+            self.style[0] = colors
+        self.texture.set_data(self.style)
+        self.update()
+
+    def on_resize(self, event):
+        """use the entire canvas"""
+        gloo.set_viewport(0, 0, *event.physical_size)
+
+    def on_draw(self, event):
+        """all the channels, one line_strip"""
+        gloo.set_clear_color((1.0, 1.0, 1.0, 1.0))
+        gloo.clear()
+        gloo.set_state(blend=True, blend_func=("src_alpha", "one_minus_src_alpha"))
+        self.program.draw("line_strip")
+
+
+# run
+if __name__ == "__main__":
+    CHANNELS, SAMPLES = 256, 10000
+    t = np.linspace(0.0, 1.0, SAMPLES)
+    freqs = np.linspace(1.0, 20.0, CHANNELS)[:, np.newaxis]
+    signals = 0.4 * np.sin(2 * np.pi * freqs * t)
+    signals += np.random.normal(0.0, 0.05, signals.shape)
+    hue = np.linspace(0.0, 0.8, CHANNELS)
+    rgba = np.ones((CHANNELS, 4))
+    rgba[:, 0] = 0.5 + 0.5 * np.cos(2 * np.pi * hue)
+    rgba[:, 1] = 0.5 + 0.5 * np.cos(2 * np.pi * (hue - 1.0 / 3))
+    rgba[:, 2] = 0.5 + 0.5 * np.cos(2 * np.pi * (hue - 2.0 / 3))
+    c = StackedPlot(signals, colors=0.8 * rgba + [0, 0, 0, 0.2])
+    c.show()
+    app.run()
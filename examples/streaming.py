@@ -0,0 +1,235 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" streaming line plot with a GPU ring buffer, 02-plot.py for live signals
+
+02-plot.py uploads its samples once. an acquisition streams new samples
+at every frame, shifting the whole window (np.roll + set_data) costs the
+window length per frame. here the samples of all the channels live in a
+ring of `capacity` rows on the GPU
+
+    row s = (channel 0, channel 1, ...) of one time step
+
+appending n samples uploads n rows (one or two set_subdata at the wrap),
+and the x coordinate is computed in the vertex shader from the slot of a
+sample and the head of the ring (u_head), so the CPU and bus cost of a
+frame is proportional to the new samples, not to the window length.
+
+a line_strip drawn in slot order would join the newest sample to the
+oldest one, each channel is drawn as two ranges [head, capacity] and
+[0, head), row `capacity` mirrors row 0 to link the two.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import app, gloo
+from vispy.gloo.util import check_enum
+
+vertex = """
+uniform float u_head;       // next slot written, the oldest sample if full
+uniform float u_capacity;   // number of slots of the ring
+uniform float u_offset;     // y of the channel
+uniform float u_scale;      // y scale of the channel
+attribute float a_slot;
+attribute float a_value;
+
+void main(void)
+{
+    // age of the sample in [0, capacity), 0 is the oldest one
+    float age = mod(a_slot - u_head, u_capacity);
+    float x = 2.0 * age / (u_capacity - 1.0) - 1.0;
+    gl_Position = vec4(x, u_offset + u_scale * a_value, 0.0, 1.0);
+}
+"""
+
+fragment = """
+uniform vec4 u_color;
+
+void main()
+{
+    gl_FragColor = u_color;
+}
+"""
+
+
+# the draw modes of Program.draw
+DRAW_MODES = (
+    "points",
+    "lines",
+    "line_strip",
+    "line_loop",
+    "triangles",
+    "triangle_strip",
+    "triangle_fan",
+)
+
+
+def draw_range(canvas, program, mode, first, count):
+    """program.draw of the vertices [first, first + count)
+
+    Program.draw has no (first, count) selection, only all the vertices
+    or an IndexBuffer, which would be uploaded again at every frame as
+    the ranges move. the GLIR DRAW command of Program.draw takes the
+    selection of glDrawArrays, it is issued here after the checks of
+    Program.draw (mode, sizes of the attributes).
+    """
+    mode = check_enum(mode)
+    if mode not in DRAW_MODES:
+        raise ValueError("Invalid draw mode: %r" % mode)
+    if count < 1:
+        return
+    # pylint: disable=protected-access
+    sizes = set(
+        a.size
+        for a in program._user_variables.values()
+        if isinstance(a, gloo.buffer.DataBuffer) and getattr(a, "divisor", None) is None
+    )
+    if len(sizes) != 1:
+        raise RuntimeError("all attributes must be set with the same size")
+    if first < 0 or first + count > sizes.pop():
+        raise ValueError(
+            "vertices [%d, %d) out of the attributes" % (first, first + count)
+        )
+    glir = canvas.context.glir
+    glir.associate(program.glir)
+    glir.command("DRAW", program._id, mode, (int(first), int(count)), 1)
+    canvas.context.flush_commands()
+
+
+class SignalRing(object):
+    """fixed capacity ring of multi-channel samples in a vertex buffer"""
+
+    def __init__(self, capacity, channels=1):
+        """allocate capacity + 1 rows of channels float32 values"""
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        if self.capacity < 2:
+            raise ValueError("a ring needs at least 2 slots")
+        self.dtype = np.dtype([("c%d" % c, np.float32) for c in range(self.channels)])
+        self.buffer = gloo.VertexBuffer(np.zeros(self.capacity + 1, self.dtype))
+        self.slots = gloo.VertexBuffer(np.arange(self.capacity + 1, dtype=np.float32))
+        self.head = 0
+        self.count = 0
+
+    def channel(self, c):
+        """the values of channel c, a view of the buffer for an attribute"""
+        return self.buffer["c%d" % c]
+
+    def _upload(self, rows, slot):
+        """write rows from slot, row 0 is mirrored in the extra row"""
+        self.buffer.set_subdata(rows, offset=slot)
+        if slot == 0:
+            self.buffer.set_subdata(rows[:1], offset=self.capacity)
+
+    def append(self, samples):
+        """append (n, channels) samples, the oldest ones are overwritten
+
+        samples of a single channel may be given as a (n,) array.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        if samples.ndim != 2 or samples.shape[1] != self.channels:
+            raise ValueError("samples must be (n, %d)" % self.channels)
+        n = samples.shape[0]
+        if n == 0:
+            return
+        if n > self.capacity:
+            # only the last capacity samples remain, skip the others
+            self.head = (self.head + n - self.capacity) % self.capacity
+            samples = samples[-self.capacity :]
+            n = self.capacity
+        rows = np.ascontiguousarray(samples).view(self.dtype).ravel()
+        first = min(n, self.capacity - self.head)
+        self._upload(rows[:first], self.head)
+        if first < n:
+            self._upload(rows[first:], 0)
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def ranges(self):
+        """(first, count) vertex ranges drawing the samples, oldest first"""
+        if self.count < self.capacity:
+            # not wrapped yet, head == count
+            return [(0, self.count)]
+        if self.head == 0:
+            return [(0, self.capacity)]
+        return [(self.head, self.capacity + 1 - self.head), (0, self.head)]
+
+
+class StreamingPlot(app.Canvas):
+    """stacked channels scrolling from right to left"""
+
+    def __init__(self, channels=16, capacity=100000, colors=None, scale=1.0, **kwargs):
+        """
+        Parameters
+        ----------
+        channels : int
+            number of signals, stacked from top to bottom
+        capacity : int
+            samples shown per channel (the window length)
+        colors : NDArray
+            (channels, 4) RGBA, default to black
+        scale : float
+            y scale of the values, 1 spans the height of a channel
+        kwargs : dict
+            app.Canvas arguments
+        """
+        kwargs.setdefault("size", (800, 400))
+        kwargs.setdefault("keys", "interactive")
+        app.Canvas.__init__(self, **kwargs)
+        self.ring = SignalRing(capacity, channels)
+        if colors is None:
+            colors = np.tile([0.0, 0.0, 0.0, 1.0], (channels, 1))
+        self.colors = np.asarray(colors, dtype=np.float32)
+        # the channels share the height of the canvas
+        self.offsets = 1.0 - (2.0 * np.arange(channels) + 1.0) / channels
+        self.scale = scale / float(channels)
+
+        self.program = gloo.Program(vert=vertex, frag=fragment)
+        self.program["a_slot"] = self.ring.slots
+        self.program["u_capacity"] = float(self.ring.capacity)
+
+    def append(self, samples):
+        """append (n, channels) samples and redraw"""
+        self.ring.append(samples)
+        self.update()
+
+    def on_resize(self, event):
+        """use the entire canvas"""
+        gloo.set_viewport(0, 0, *event.physical_size)
+
+    def on_draw(self, event):
+        """one line_strip per channel and range of the ring"""
+        gloo.set_clear_color((1.0, 1.0, 1.0, 1.0))
+        gloo.clear()
+        program = self.program
+        program["u_head"] = float(self.ring.head)
+        program["u_scale"] = self.scale
+        ranges = self.ring.ranges()
+        for c in range(self.ring.channels):
+            program["a_value"] = self.ring.channel(c)
+            program["u_offset"] = self.offsets[c]
+            program["u_color"] = self.colors[c]
+            for first, count in ranges:
+                draw_range(self, program, "line_strip", first, count)
+
+
+# run
+if __name__ == "__main__":
+    CHANNELS, RATE, WINDOW = 16, 100000, 2.0
+    plot = StreamingPlot(CHANNELS, int(RATE * WINDOW))
+    state = {"t": 0.0}
+    freqs = np.linspace(1.0, 8.0, CHANNELS)
+
+    def acquire(event):
+        """synthetic acquisition, the samples of the last timer interval"""
+        n = int(RATE * event.dt) if event.dt else 0
+        t = state["t"] + np.arange(n)[:, np.newaxis] / RATE
+        state["t"] += n / float(RATE)
+        samples = 0.4 * np.sin(2 * np.pi * freqs * t)
+        samples += np.random.normal(0.0, 0.05, samples.shape)
+        plot.append(samples)
+
+    timer = app.Timer(1.0 / 60.0, connect=acquire, start=True)
+    plot.show()
+    app.run()
@@ -0,0 +1,283 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" binary container of a tetrahedral mesh and its time steps
+
+a .tet file holds the points (float32), the simplices (uint32), the
+topology of the drawing modes (see topology.EXTRACTORS) and any number of
+time steps of a scalar field on the points, appended at the end,
+
+    header    magic, version, number of sections, table of the sections
+              (name, dtype, columns, byte offset, rows), HEADER_BYTES
+    sections  rows x columns little-endian arrays, aligned on ALIGN bytes
+    steps     the last section, rows grows at every append
+
+every section is a read-only np.memmap on load, so opening a file reads
+the header only and a time step is read from disk when it is used.
+
+    write_tetplot_file("mesh.tet", points, simplices)
+    f = load_tetplot_file("mesh.tet", mode="r+")
+    f.append(values)
+    tetplot(f.points, f.simplices, scalar=f.step(-1), cache=f)
+
+the file is a topology cache of its own simplices (TetFile.get), so
+tetplot does not extract the faces again. usage from the command line,
+
+    $ python tetfile.py info mesh.tet
+"""
+from __future__ import absolute_import
+
+import argparse
+import os
+import struct
+
+import numpy as np
+
+from topology import EXTRACTORS
+from topostream import extract
+
+MAGIC = b"TETPLOT\0"
+VERSION = 1
+HEADER_BYTES = 4096
+ALIGN = 4096
+# bytes converted and written at a time
+CHUNK_BYTES = 64 * 2**20
+
+# magic, version, number of sections
+HEAD = struct.Struct("<8sII")
+# name, dtype, columns, byte offset, rows
+ENTRY = struct.Struct("<16s4sIQQ")
+MAX_SECTIONS = (HEADER_BYTES - HEAD.size) // ENTRY.size
+
+DTYPES = {"points": "<f4", "simplices": "<u4", "steps": "<f4"}
+
+
+def _aligned(offset):
+    """next multiple of ALIGN"""
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _write_rows(fh, data, dtype):
+    """write data converted to dtype, CHUNK_BYTES at a time"""
+    row = max(int(np.prod(data.shape[1:])), 1) * np.dtype(dtype).itemsize
+    rows = max(CHUNK_BYTES // row, 1)
+    for lo in range(0, data.shape[0], rows):
+        part = np.ascontiguousarray(data[lo : lo + rows], dtype=dtype)
+        fh.write(memoryview(part).cast("B"))
+
+
+def _steps(values, n):
+    """T x n time steps of a n scalar field or T x n fields"""
+    values = np.asarray(values)
+    if values.ndim not in (1, 2) or values.shape[-1] != n:
+        raise ValueError(
+            "time steps must be %d or T x %d, got %s" % (n, n, values.shape)
+        )
+    return values.reshape(-1, n)
+
+
+def _header(entries):
+    """header bytes of a list of (name, dtype, columns, offset, rows)"""
+    if len(entries) > MAX_SECTIONS:
+        raise ValueError("at most %d sections" % MAX_SECTIONS)
+    head = HEAD.pack(MAGIC, VERSION, len(entries))
+    for name, dtype, cols, offset, rows in entries:
+        head += ENTRY.pack(name.encode(), dtype[1:].encode(), cols, offset, rows)
+    return head.ljust(HEADER_BYTES, b"\0")
+
+
+def write_tetplot_file(
+    path,
+    points,
+    simplices,
+    kinds=("triangles", "boundary", "lines"),
+    steps=None,
+    max_bytes=None,
+    workers=None,
+):
+    """write a mesh, its topology and optional time steps
+
+    Parameters
+    ----------
+    path : str
+        file name, overwritten
+    points : NDArray
+        N x 3 points coordinates, stored as float32
+    simplices : NDArray
+        M x 4 connectivity matrix, stored as uint32
+    kinds : tuple of str
+        topology stored with the mesh, keys of topology.EXTRACTORS
+    steps : NDArray
+        T x N scalar fields, more can be appended later
+    max_bytes, workers : int
+        options of the topology extraction, see topostream.extract
+    """
+    points = np.asarray(points)
+    simplices = np.asarray(simplices)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError("points must be N x 3, got %s" % (points.shape,))
+    if simplices.ndim != 2 or simplices.shape[1] != 4:
+        raise ValueError("simplices must be M x 4, got %s" % (simplices.shape,))
+    if simplices.size and (simplices.min() < 0 or simplices.max() >= 2**32):
+        raise ValueError("simplices must be indices in [0, 2**32)")
+    n = points.shape[0]
+    if steps is None:
+        steps = np.empty((0, n), dtype=np.float32)
+    steps = _steps(steps, n)
+
+    arrays = [("points", points), ("simplices", simplices)]
+    raws = []
+    try:
+        for kind in kinds:
+            if kind not in EXTRACTORS:
+                raise ValueError("topology kind = " + kind + " not supported")
+            out = None
+            if max_bytes is not None:
+                # streamed to a raw file next to path, not held in memory
+                out = "%s.%s.raw" % (path, kind)
+                raws.append(out)
+            arrays.append((kind, extract(simplices, kind, max_bytes, workers, out)))
+        arrays.append(("steps", steps))
+        _write_sections(path, arrays)
+    finally:
+        for raw in raws:
+            if os.path.exists(raw):
+                os.remove(raw)
+
+
+def _write_sections(path, arrays):
+    """write the header and the (name, array) sections"""
+    entries, offset = [], HEADER_BYTES
+    for name, data in arrays:
+        dtype = DTYPES.get(name, "<u4")
+        cols = max(int(np.prod(data.shape[1:])), 1)
+        entries.append((name, dtype, cols, offset, data.shape[0]))
+        offset = _aligned(offset + data.shape[0] * cols * 4)
+
+    with open(path, "wb") as fh:
+        fh.write(_header(entries))
+        for (name, dtype, _, offset, _), (_, data) in zip(entries, arrays):
+            fh.seek(offset)
+            _write_rows(fh, data, dtype)
+
+
+class TetFile(object):
+    """sections of a .tet file as memory maps, see load_tetplot_file"""
+
+    def __init__(self, path, mode="r"):
+        """read the header and map the sections
+
+        mode='r+' allows append, the sections stay read-only.
+        """
+        if mode not in ("r", "r+"):
+            raise ValueError("mode must be 'r' or 'r+'")
+        self.path = path
+        self.mode = mode
+        with open(path, "rb") as fh:
+            head = fh.read(HEADER_BYTES)
+        if len(head) < HEADER_BYTES or head[:8] != MAGIC:
+            raise ValueError("%s is not a tetplot file" % path)
+        magic, self.version, count = HEAD.unpack_from(head)
+        if self.version > VERSION:
+            raise ValueError(
+                "%s has version %d, this reader knows %d"
+                % (path, self.version, VERSION)
+            )
+        self.entries = {}
+        for i in range(count):
+            name, dtype, cols, offset, rows = ENTRY.unpack_from(
+                head, HEAD.size + i * ENTRY.size
+            )
+            name = name.rstrip(b"\0").decode()
+            dtype = "<" + dtype.rstrip(b"\0").decode()
+            self.entries[name] = [i, dtype, cols, offset, rows]
+        self.points = self._map("points").reshape(-1, 3)
+        self.simplices = self._map("simplices").reshape(-1, 4)
+        self.topology = {
+            name: self._map(name) for name in self.entries if name in EXTRACTORS
+        }
+        self.steps = self._map("steps")
+
+    def _map(self, name):
+        """read-only memory map of a section"""
+        _, dtype, cols, offset, rows = self.entries[name]
+        if rows == 0:
+            return np.empty((0, cols), dtype=dtype)
+        return np.memmap(
+            self.path, dtype=dtype, mode="r", offset=offset, shape=(rows, cols)
+        )
+
+    def __len__(self):
+        """number of time steps"""
+        return self.steps.shape[0]
+
+    def step(self, i):
+        """scalar field of time step i, read when it is used"""
+        return self.steps[i]
+
+    def timesteps(self, start=0, stop=None):
+        """iterate over the time steps [start, stop)"""
+        stop = len(self) if stop is None else stop
+        for i in range(start, stop):
+            yield self.steps[i]
+
+    def append(self, values):
+        """append time steps, a N scalar field or T x N fields"""
+        if self.mode != "r+":
+            raise ValueError("the file is open read-only")
+        index, dtype, cols, offset, rows = self.entries["steps"]
+        values = _steps(values, cols)
+        with open(self.path, "r+b") as fh:
+            # the data first, the readers see the new rows with the header
+            fh.seek(offset + rows * cols * 4)
+            _write_rows(fh, values, dtype)
+            fh.flush()
+            rows += values.shape[0]
+            name = b"steps"
+            fh.seek(HEAD.size + index * ENTRY.size)
+            fh.write(ENTRY.pack(name, dtype[1:].encode(), cols, offset, rows))
+        self.entries["steps"][4] = rows
+        self.steps = self._map("steps")
+
+    def get(self, simplices, kind="triangles", **kwargs):
+        """topology of kind, as TopologyCache.get
+
+        the stored array if simplices are the ones of the file, else the
+        topology is extracted (kwargs are passed to topostream.extract).
+        """
+        if kind not in EXTRACTORS:
+            raise ValueError("topology kind = " + kind + " not supported")
+        simplices = np.asarray(simplices)
+        mine = self.simplices
+        same = simplices.shape == mine.shape and (
+            simplices.ctypes.data == mine.ctypes.data or np.array_equal(simplices, mine)
+        )
+        if same and kind in self.topology:
+            return self.topology[kind]
+        return extract(simplices, kind, **kwargs)
+
+    @property
+    def nbytes(self):
+        """size of the file in bytes"""
+        return os.path.getsize(self.path)
+
+
+def load_tetplot_file(path, mode="r"):
+    """open a .tet file, see TetFile"""
+    return TetFile(path, mode)
+
+
+def main():
+    """describe a file"""
+    parser = argparse.ArgumentParser(description="tetplot file")
+    parser.add_argument("command", choices=["info"])
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    f = load_tetplot_file(args.path)
+    print("%s, version %d, %.1f MB" % (f.path, f.version, f.nbytes / 2**20))
+    for name, (_, dtype, cols, offset, rows) in f.entries.items():
+        print("%12s %6s %10d x %-3d at %d" % (name, dtype, rows, cols, offset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" program and GPU buffers of the gloo tetplot
+
+the program of tetplot-gloo.py, shared with the offscreen BatchRenderer
+(see batch). the points and colors are vertex buffers, the faces and the
+edges index buffers, all of them grow-only (see dynbuffer), so a frame
+that fits the buffers is uploaded without reallocation.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import gloo
+from vispy.util.transforms import translate, perspective, rotate
+
+from dynbuffer import DynamicBuffer
+
+# build vertex shader for tetplot
+vertex = """
+uniform mat4   u_model;         // Model matrix
+uniform mat4   u_view;          // View matrix
+uniform mat4   u_projection;    // Projection matrix
+uniform vec4   u_color;         // mask color for edge plotting
+attribute vec3 a_position;
+attribute vec4 a_color;
+varying vec4   v_color;
+
+void main()
+{
+    gl_Position = u_projection * u_view * u_model * vec4(a_position, 1.0);
+    v_color = a_color * u_color;
+}
+"""
+
+# build fragment shader for tetplot
+fragment = """
+varying vec4 v_color;
+
+void main()
+{
+    gl_FragColor = v_color;
+}
+"""
+
+
+class TetProgram(object):
+    """the tetplot program with its vertex and index buffers"""
+
+    def __init__(self):
+        self.program = gloo.Program(vert=vertex, frag=fragment)
+        self.points = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self.colors = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self.faces = DynamicBuffer(gloo.IndexBuffer, np.uint32)
+        self.edges = DynamicBuffer(gloo.IndexBuffer, np.uint32)
+
+        # intialize transformation matrix
+        for name in ("u_model", "u_view", "u_projection"):
+            self.program[name] = np.eye(4, dtype=np.float32)
+        self.program["u_color"] = [1.0, 1.0, 1.0, 1.0]
+
+    def set_data(self, points=None, colors=None, faces=None, edges=None, offset=None):
+        """upload the given data, only the buffers that grow are reallocated
+
+        offset, if given, patches the rows of points and colors starting
+        at offset.
+        """
+        if points is not None and self.points.set(points, offset):
+            self.program["a_position"] = self.points.buffer
+        if colors is not None and self.colors.set(colors, offset):
+            self.program["a_color"] = self.colors.buffer
+        if faces is not None:
+            self.faces.set(faces)
+        if edges is not None:
+            self.edges.set(edges)
+
+    def set_ratio(self, ratio):
+        """perspective projection of a viewport of ratio width / height"""
+        self.program["u_projection"] = perspective(45.0, ratio, 2.0, 10.0)
+
+    def view(self, z=5.0, theta=0.0, phi=0.0):
+        """change the zoom factor and view point"""
+        self.program["u_view"] = translate((0, 0, -z))
+        model = np.dot(rotate(theta, (0, 1, 0)), rotate(phi, (0, 0, 1)))
+        self.program["u_model"] = model
+
+    def draw(self, face_color, edge_color=None):
+        """translucent faces, and the edges if edge_color is given"""
+        gloo.set_state("translucent")
+        gloo.set_state(blend=True, depth_test=False, polygon_offset_fill=True)
+        self.program["u_color"] = face_color
+        self.program.draw("triangles", self.faces.buffer)
+        if edge_color is not None and self.edges.size > 0:
+            self.program["u_color"] = edge_color
+            self.program.draw("lines", self.edges.buffer)
@@ -3,37 +3,11 @@
 """ plot function based on vispy for tetrahedral plots """
 from __future__ import absolute_import
 
-from itertools import combinations
 import numpy as np
 from vispy import app, gloo
-from vispy.util.transforms import translate, perspective, rotate
-
-# build vertex shader for tetplot
-vertex = """
-uniform mat4   u_model;         // Model matrix
-uniform mat4   u_view;          // View matrix
-uniform mat4   u_projection;    // Projection matrix
-uniform vec4   u_color;         // mask color for edge plotting
-attribute vec3 a_position;
-attribute vec4 a_color;
-varying vec4   v_color;
-
-void main()
-{
-    gl_Position = u_projection * u_view * u_model * vec4(a_position, 1.0);
-    v_color = a_color * u_color;
-}
-"""
-
-# build fragment shader for tetplot
-fragment = """
-varying vec4 v_color;
-
-void main()
-{
-    gl_FragColor = v_color;
-}
-"""
+
+from tetgloo import TetProgram
+from topology import sim2tri, sim2edge
 
 
 class Canvas(app.Canvas):
@@ -43,31 +17,13 @@ class Canvas(app.Canvas):
         """initialize the canvas"""
         app.Canvas.__init__(self, size=figsize, title=title, keys="interactive")
 
-        # shader program
-        tet = gloo.Program(vert=vertex, frag=fragment)
-
-        # bind to data
-        tet["a_position"] = V
-        tet["a_color"] = C
-        self.I = gloo.IndexBuffer(I)
-        self.E = gloo.IndexBuffer(E)
-
-        # intialize transformation matrix
-        view = np.eye(4, dtype=np.float32)
-        model = np.eye(4, dtype=np.float32)
-        projection = np.eye(4, dtype=np.float32)
-
-        tet["u_model"] = model
-        tet["u_view"] = view
-        tet["u_projection"] = projection
-
-        # bind your program
-        self.program = tet
+        # shader program and GPU buffers, reused by tetplot
+        self.tet = TetProgram()
+        self.tetplot(V, C, I, E)
 
         # config and set viewport
         gloo.set_viewport(0, 0, *self.physical_size)
         gloo.set_clear_color("white")
-        gloo.set_state("translucent")
         gloo.set_polygon_offset(0.0, 0.0)
 
         # update parameters
@@ -87,43 +43,33 @@ class Canvas(app.Canvas):
 
     def on_resize(self, event):
         """canvas resize callback"""
-        ratio = event.physical_size[0] / float(event.physical_size[1])
-        self.program["u_projection"] = perspective(45.0, ratio, 2.0, 10.0)
+        self.tet.set_ratio(event.physical_size[0] / float(event.physical_size[1]))
         gloo.set_viewport(0, 0, *event.physical_size)
 
     def on_draw(self, event):
         """canvas update callback"""
         gloo.clear()
 
-        # Filled cube
-        gloo.set_state(blend=True, depth_test=False, polygon_offset_fill=True)
-        self.program["u_color"] = [1.0, 1.0, 1.0, 0.6]
-        self.program.draw("triangles", self.I)
-
-        # draw outline
-        # gloo.set_state(blend=True, depth_test=False,
-        #                polygon_offset_fill=True)
-        # self.program['u_color'] = [0.0, 0.0, 0.0, 0.5]
-        # self.program.draw('lines', self.E)
+        # Filled cube, pass an edge color to draw the outline
+        self.tet.draw([1.0, 1.0, 1.0, 0.6])
 
     def on_timer(self, event):
         self.theta += 0.5
         self.phi += 0.5
         self.view(theta=self.theta, phi=self.phi)
 
-    def tetplot(self, V, C=None, I=None, E=None):
-        """plot tetrahedron"""
-        self.program["a_position"] = V
-        self.program["a_color"] = C
-        self.I = gloo.IndexBuffer(I)
-        self.E = gloo.IndexBuffer(E)
+    def tetplot(self, V=None, C=None, I=None, E=None, offset=None):
+        """plot tetrahedron, only the given (and changed) data are uploaded
+
+        offset, if given, patches the rows of V and C starting at offset,
+        the buffers are reallocated only when the data outgrow them.
+        """
+        self.tet.set_data(V, C, I, E, offset)
         self.update()
 
     def view(self, z=5, theta=0.0, phi=0.0):
         """change the zoom factor and view point"""
-        self.program["u_view"] = translate((0, 0, -self.z))
-        model = np.dot(rotate(self.theta, (0, 1, 0)), rotate(self.phi, (0, 0, 1)))
-        self.program["u_model"] = model
+        self.tet.view(self.z, self.theta, self.phi)
         self.update()
 
 
@@ -142,25 +88,6 @@ def tetplot(points, simplices):
     app.run()
 
 
-def sim_conv(simplices, N=3):
-    """simplices to any dimension"""
-    v = [list(combinations(sim, N)) for sim in simplices]
-    t = np.sort(np.array(v).reshape(-1, N), axis=1)
-    # delete duplicated entries
-    t_unique = np.unique(t.view([("", t.dtype)] * N)).view(np.uint32)
-    return t_unique
-
-
-def sim2tri(simplices):
-    """convert simplices of high dimension to indices of triangles"""
-    return sim_conv(simplices, 3)
-
-
-def sim2edge(simplices):
-    """convert simplices of high dimension to indices of edges"""
-    return sim_conv(simplices, 2)
-
-
 if __name__ == "__main__":
     pts = np.array(
         [
@@ -3,11 +3,21 @@
 """ plot function based on vispy for tetrahedral plots """
 from __future__ import absolute_import
 
-from itertools import combinations
 import numpy as np
 import sys
 
 from vispy import app, gloo, visuals, scene
+from vispy.color import get_colormap
+
+from dynbuffer import DynamicBuffer, as_rows
+from topocache import TopologyCache
+from clipping import ClipPlane, TetSlicer
+from culling import ChunkedBVH
+from lod import InteractiveLOD, lod_levels, select_level
+from peeling import DepthPeeling
+from topology import sim_owner
+from topostream import extract
+from wboit import WeightedBlendedOIT
 
 
 # build vertex shader for tetplot
@@ -36,25 +46,128 @@ void main()
 }
 """
 
+# vertex shader for scalar fields, the scalar is normalized by clim
+vert_scalar = """
+uniform vec2 u_clim;
+attribute float a_scalar;
+varying float v_scalar;
+
+void main()
+{
+    vec4 visual_pos = vec4($position, 1);
+    vec4 doc_pos = $visual_to_doc(visual_pos);
+    gl_Position = $doc_to_render(doc_pos);
+
+    v_scalar = (a_scalar - u_clim.x) / (u_clim.y - u_clim.x);
+}
+"""
+
+# fragment shader for scalar fields, colors are looked up in a texture
+frag_scalar = """
+uniform vec4 u_color;
+uniform sampler2D u_cmap;
+varying float v_scalar;
+
+void main()
+{
+    // sample at the texel centers of a CMAP_SIZE x 1 texture
+    float t = clamp(v_scalar, 0.0, 1.0);
+    float x = (0.5 + t * (CMAP_SIZE - 1.0)) / CMAP_SIZE;
+    gl_FragColor = texture2D(u_cmap, vec2(x, 0.5)) * u_color;
+}
+"""
+
+# vertex shader for per-element values, each corner of a face carries
+# (point id, cell id), positions and cell values are fetched from textures.
+# an id is split into (id // TEX_WIDTH, id % TEX_WIDTH), its texel, both
+# are exact in float32 (ids alone are exact up to 2**24 only)
+vert_cell = """
+uniform vec4 u_color;
+uniform vec2 u_clim;
+uniform sampler2D u_points;
+uniform sampler2D u_cells;
+uniform vec2 u_points_shape;
+uniform vec2 u_cells_shape;
+attribute vec4 a_corner;    // point (row, column), cell (row, column)
+varying float v_scalar;
+varying vec4 v_color;
 
-def sim_conv(simplices, N=3):
-    """simplices to any dimension"""
-    v = [list(combinations(sim, N)) for sim in simplices]
-    # change to (num_of_points x N)
-    t = np.sort(np.array(v).reshape(-1, N), axis=1)
-    # delete duplicated entries
-    t_unique = np.unique(t.view([("", t.dtype)] * N)).view(np.uint32)
-    return t_unique
+// texture coordinates of the (row, column) item of a (width, height) texture
+vec2 texel(vec2 id, vec2 shape)
+{
+    return (id.yx + 0.5) / shape;
+}
 
+void main()
+{
+    vec3 position = texture2D(u_points, texel(a_corner.xy, u_points_shape)).xyz;
+    vec4 visual_pos = vec4(position, 1);
+    vec4 doc_pos = $visual_to_doc(visual_pos);
+    gl_Position = $doc_to_render(doc_pos);
 
-def sim2tri(simplices):
-    """convert simplices of high dimension to indices of triangles"""
-    return sim_conv(simplices, 3)
+    vec4 cell = texture2D(u_cells, texel(a_corner.zw, u_cells_shape));
+    v_scalar = (cell.r - u_clim.x) / (u_clim.y - u_clim.x);
+    v_color = cell * u_color;
+}
+"""
+
+# number of entries of the colormap texture
+CMAP_SIZE = 256
+
+# width of the data textures, and height limit (a common
+# GL_MAX_TEXTURE_SIZE), 2**26 points or cells at most
+TEX_WIDTH = 4096
+TEX_HEIGHT = 16384
+
+
+def cmap_texture(cmap):
+    """1 x CMAP_SIZE RGBA texture of a vispy colormap (name or object)"""
+    colors = get_colormap(cmap).map(np.linspace(0.0, 1.0, CMAP_SIZE))
+    colors = np.asarray(colors, dtype=np.float32).reshape(1, CMAP_SIZE, 4)
+    return gloo.Texture2D(colors, interpolation="linear")
+
+
+def data_texture(values):
+    """pack N x C float32 values row-major into a (H, TEX_WIDTH) texture
+
+    the width is always TEX_WIDTH, so item i is the texel
+    (i // TEX_WIDTH, i % TEX_WIDTH) whatever N, see split_ids
+
+    Returns
+    -------
+    texture : gloo.Texture2D
+        nearest sampled float texture
+    shape : (float, float)
+        (width, height) of the texture, used by texel() in vert_cell
+    """
+    values = np.asarray(values, dtype=np.float32)
+    n = values.shape[0]
+    c = 1 if values.ndim == 1 else values.shape[1]
+    width = TEX_WIDTH
+    height = max(1, -(-n // width))
+    if height > TEX_HEIGHT:
+        raise ValueError("at most %d items per data texture" % (width * TEX_HEIGHT))
+    data = np.zeros((height * width, c), dtype=np.float32)
+    data[:n] = values.reshape(n, c)
+    if c == 1:
+        data = data.reshape(height, width)
+        fmt = ("luminance", "r32f")
+    else:
+        data = data.reshape(height, width, c)
+        fmt = {3: ("rgb", "rgb32f"), 4: ("rgba", "rgba32f")}[c]
+    texture = gloo.Texture2D(
+        data, format=fmt[0], internalformat=fmt[1], interpolation="nearest"
+    )
+    return texture, (float(width), float(height))
 
 
-def sim2edge(simplices):
-    """convert simplices of high dimension to indices of edges"""
-    return sim_conv(simplices, 2)
+def split_ids(ids):
+    """(row, column) float32 of ids in a data texture, exact for any id"""
+    ids = np.asarray(ids, dtype=np.int64)
+    out = np.empty(ids.shape + (2,), dtype=np.float32)
+    out[..., 0] = ids // TEX_WIDTH
+    out[..., 1] = ids % TEX_WIDTH
+    return out
 
 
 class TetPlotVisual(visuals.Visual):
@@ -68,6 +181,15 @@ class TetPlotVisual(visuals.Visual):
         color=None,
         alpha=1.0,
         mode="triangles",
+        cache=None,
+        max_bytes=None,
+        workers=None,
+        scalar=None,
+        cmap="viridis",
+        clim=None,
+        cell_value=None,
+        lod_budget=None,
+        cull=None,
     ):
         """initialize tetrahedra face plot
 
@@ -77,43 +199,342 @@ class TetPlotVisual(visuals.Visual):
             N x 3 points coordinates
         simplices : NDArray of uint32
             N x 4 connectivity matrix
+        mode : str
+            'triangles' draws all the faces, 'boundary' only the faces
+            on the outer surface, 'lines' draws the edges
+        cache : TopologyCache
+            if given, the extracted topology is loaded from (or stored to)
+            this on-disk cache
+        max_bytes : int
+            if given, the topology is extracted in chunks within this
+            memory budget, simplices may then be a np.memmap
+        workers : int
+            number of processes of the topology extraction
+        scalar : NDArray of float32
+            N scalar field on the points, if given the colors are looked
+            up in cmap on the GPU and vertex_color is ignored
+        cmap : str or Colormap
+            vispy colormap of the scalar field
+        clim : (float, float)
+            color limits of the scalar field, default to its (min, max)
+        cell_value : NDArray of float32
+            per-element values, M scalars (mapped by cmap and clim) or
+            M x 4 colors. every face is colored by its owning tetrahedron,
+            looked up in a texture by cell id, so points are not
+            duplicated. not supported in 'lines' mode, and the cache,
+            max_bytes and workers options do not apply.
+        lod_budget : int
+            if given, decimated index buffers are built (see lod), and
+            set_lod(True) draws the finest one with at most lod_budget
+            triangles (or lines). not supported with cell_value.
+        cull : int
+            if given, the faces are grouped in chunks of this size with
+            bounding boxes (see culling), the chunks outside the view
+            frustum are not drawn. not supported with cell_value.
 
         Note
         ----
         initialize triangles structure
         """
-        visuals.Visual.__init__(self, vcode=vert, fcode=frag)
+        if mode not in ("triangles", "boundary", "lines"):
+            raise ValueError("Drawing mode = " + mode + " not supported")
+        if cell_value is not None and mode == "lines":
+            raise ValueError("cell_value is not supported in lines mode")
+        if cell_value is not None and lod_budget is not None:
+            raise ValueError("lod_budget is not supported with cell_value")
+        if cell_value is not None and cull is not None:
+            raise ValueError("cull is not supported with cell_value")
+
+        # what the colors are made of: 'vertex', 'scalar' or 'cell'
+        if cell_value is not None:
+            self._color_by = "cell"
+            self._scalar_mode = np.ndim(cell_value) == 1
+        else:
+            self._color_by = "vertex" if scalar is None else "scalar"
+            self._scalar_mode = scalar is not None
+        vcode = {"vertex": vert, "scalar": vert_scalar, "cell": vert_cell}
+        if self._scalar_mode:
+            fcode = frag_scalar.replace("CMAP_SIZE", "%.1f" % CMAP_SIZE)
+        else:
+            fcode = frag
+        visuals.Visual.__init__(self, vcode=vcode[self._color_by], fcode=fcode)
+
+        self.set_color(color, alpha)
+
+        # GPU buffers, reused by set_data
+        self._points = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self._colors = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self._indices = DynamicBuffer(gloo.IndexBuffer, np.uint32)
+        self._scalars = DynamicBuffer(gloo.VertexBuffer, np.float32)
+        self._corners = DynamicBuffer(gloo.VertexBuffer, np.float32)
+
+        # scalar field, only the clim uniform changes when the limits move
+        if self._scalar_mode:
+            self.set_cmap(cmap)
+            if clim is None:
+                field = scalar if scalar is not None else cell_value
+                clim = (float(np.min(field)), float(np.max(field)))
+            self.set_clim(clim)
+
+        # level of detail, index buffers of the decimated levels
+        self._lod_budget = lod_budget
+        self._lod = []
+
+        # frustum culling, faces of the visible chunks
+        self._cull = cull
+        self._bvh = None
+        self._culled = None
+
+        # clipping plane, see set_clip
+        self._clip = None
+        self._clip_plane = None
+
+        # topology extraction
+        self._mode = mode
+        self._extract_kw = dict(max_bytes=max_bytes, workers=workers)
+        self._cache = cache
 
         # set data
-        self.shared_program.vert["position"] = gloo.VertexBuffer(points)
-        if vertex_color is None:
-            vertex_color = np.ones((points.shape[0], 4), dtype=np.float32)
-        else:
-            assert vertex_color.shape[0] == points.shape[0]
-        self.shared_program["a_color"] = vertex_color
+        self.set_data(
+            points, simplices, vertex_color, scalar=scalar, cell_value=cell_value
+        )
 
+        # config OpenGL, the "additive" blending does not depend on the draw
+        # order, the OIT passes (see wboit and peeling) set their own state
+        self.set_gl_state(
+            "additive", blend=True, depth_test=False, polygon_offset_fill=True
+        )
+        self._draw_mode = "lines" if mode == "lines" else "triangles"
+
+    def set_color(self, color=None, alpha=1.0):
+        """change the uniform color, it multiplies the vertex colors"""
         # currently, do not support color parsing
         if color is None:
             color = [1.0, 1.0, 1.0, 1.0]
         else:
             assert len(color) == 4
+            color = list(color)
         color[-1] *= alpha
         self.shared_program["u_color"] = color
+        self.update()
+
+    def set_cmap(self, cmap):
+        """change the colormap of the scalar field"""
+        self.shared_program["u_cmap"] = cmap_texture(cmap)
+        self.update()
+
+    def set_clim(self, clim):
+        """change the color limits of the scalar field (a uniform update)"""
+        lo, hi = float(clim[0]), float(clim[1])
+        if hi == lo:
+            hi = lo + 1.0
+        self.shared_program["u_clim"] = (lo, hi)
+        self.update()
+
+    def set_data(
+        self,
+        points=None,
+        simplices=None,
+        vertex_color=None,
+        offset=None,
+        scalar=None,
+        cell_value=None,
+    ):
+        """update the data, only what changed is uploaded to the GPU
 
-        # build buffer
-        if mode == "triangles":
-            vbo = sim2tri(simplices)
-        elif mode == "lines":
-            vbo = sim2edge(simplices)
+        Parameters
+        ----------
+        points : NDArray of float32
+            N x 3 points coordinates
+        simplices : NDArray of uint32
+            N x 4 connectivity matrix, the topology is extracted again
+        vertex_color : NDArray of float32
+            N x 4 colors of the points
+        offset : int
+            if given, points, vertex_color and scalar patch the rows
+            starting at offset instead of replacing the whole arrays
+        scalar : NDArray of float32
+            N scalar field, 4 bytes per point instead of 16 for colors
+        cell_value : NDArray of float32
+            M per-element scalars or M x 4 colors
+        """
+        if self._color_by == "cell":
+            self._set_cell_data(points, simplices, cell_value)
+            return
+
+        if points is not None:
+            if self._points.set(points, offset):
+                self.shared_program.vert["position"] = self._points.buffer
+            if self._bvh is not None:
+                self._bvh.update_points(self._points.host[: self._points.size])
+            if self._scalar_mode:
+                vertex_color = None
+            elif vertex_color is None and self._colors.size != self._points.size:
+                vertex_color = np.ones((self._points.size, 4), dtype=np.float32)
+        if scalar is not None:
+            if offset is None:
+                assert scalar.shape[0] == self._points.size
+            if self._scalars.set(scalar, offset):
+                self.shared_program["a_scalar"] = self._scalars.buffer
+        if vertex_color is not None and not self._scalar_mode:
+            if offset is None:
+                assert vertex_color.shape[0] == self._points.size
+            if self._colors.set(vertex_color, offset):
+                self.shared_program["a_color"] = self._colors.buffer
+
+        if simplices is not None:
+            self._set_topology(simplices)
+        elif points is not None and self._clip is not None:
+            # the tetrahedra moved, sort the faces along the normal again
+            self._clip.points = self._points.host[: self._points.size]
+            normal, offset = self._clip_plane
+            self._clip_plane = None
+            self.set_clip(normal, offset)
+
+        self.update()
+
+    def _set_topology(self, simplices):
+        """extract and upload the faces (or edges) of the simplices"""
+        if self._cache is not None:
+            vbo = self._cache.get(simplices, self._mode, **self._extract_kw)
         else:
-            raise ValueError("Drawing mode = " + mode + " not supported")
-        self._index_buffer = gloo.IndexBuffer(vbo)
+            vbo = extract(simplices, self._mode, **self._extract_kw)
+        if self._cull is not None:
+            points = self._points.host[: self._points.size]
+            self._bvh = ChunkedBVH(points, vbo, self._cull)
+            vbo = self._bvh.faces
+        if self._indices.set(vbo) or self._bvh is not None:
+            self._index_buffer = self._indices.buffer
+        if self._lod_budget is not None:
+            self._build_lod(vbo)
+        self._simplices, self._vbo = simplices, vbo
+        if self._clip_plane is not None:
+            self._clip = None
+            self.set_clip(*self._clip_plane)
+
+    def set_clip(self, normal=None, offset=0.0):
+        """keep the tetrahedra with n.x <= offset, normal=None disables it
+
+        the faces are sorted once per normal (see clipping.ClipPlane), then
+        moving the plane only uploads the range of faces between the old
+        and the new offset. frustum culling is suspended while clipping,
+        and the LOD levels are not clipped.
+        """
+        if self._color_by == "cell":
+            raise ValueError("clipping is not supported with cell_value")
+        if normal is None:
+            self._clip = self._clip_plane = None
+            if self._indices.set(self._vbo):
+                self._index_buffer = self._indices.buffer
+            if self._bvh is not None:
+                self._bvh.visible[:] = True
+            self.update()
+            return
+
+        normal = tuple(float(x) for x in normal)
+        if self._clip is None:
+            N = 2 if self._mode == "lines" else 3
+            points = self._points.host[: self._points.size]
+            boundary = self._mode == "boundary"
+            self._clip = ClipPlane(points, self._simplices, N, boundary)
+            self._clip_plane = None
+        clip = self._clip
+        if self._clip_plane is None or self._clip_plane[0] != normal:
+            # new order of the faces, upload all
+            clip.set_normal(normal)
+            self._clip_plane = (normal, None)
+        old = self._clip_plane[1]
+        self._clip_plane = (normal, offset)
+
+        if clip.boundary:
+            if self._indices.set(clip.visible(offset)):
+                self._index_buffer = self._indices.buffer
+        elif old is None:
+            faces = clip.faces.copy()
+            faces[clip.prefix(offset) :] = 0
+            if self._indices.set(faces):
+                self._index_buffer = self._indices.buffer
+        else:
+            # contiguous range between the old and the new prefix
+            j0, j1 = clip.prefix(old), clip.prefix(offset)
+            lo, hi = min(j0, j1), max(j0, j1)
+            rows = clip.faces[lo:hi]
+            self._indices.set(rows if j1 > j0 else np.zeros_like(rows), lo)
+        self.update()
+
+    def _build_lod(self, vbo):
+        """upload the hierarchy of decimated index buffers"""
+        points = self._points.host[: self._points.size]
+        levels = lod_levels(points, vbo, min_faces=self._lod_budget // 4)
+        self._lod_sizes = [lv.shape[0] for lv in levels]
+        self._lod = [gloo.IndexBuffer(lv) for lv in levels[1:]]
+
+    def set_lod(self, coarse, budget=None):
+        """draw a decimated level (coarse=True) or the full resolution
+
+        the level is the finest one with at most budget (default to
+        lod_budget) triangles or lines.
+        """
+        if budget is not None:
+            self._lod_budget = budget
+        level = 0
+        if coarse and self._lod:
+            level = select_level(self._lod_sizes, self._lod_budget)
+        if level > 0:
+            self._index_buffer = self._lod[level - 1]
+        else:
+            self._index_buffer = self._indices.buffer
+        self.update()
 
-        # config OpenGL
-        self.set_gl_state(
-            "additive", blend=True, depth_test=False, polygon_offset_fill=True
-        )
-        self._draw_mode = mode
+    def _prepare_draw(self, view):
+        """cull the chunks outside the view frustum before drawing
+
+        the faces of the visible chunks are uploaded to their own index
+        buffer when the visibility changes, all the faces are drawn from
+        the index buffer of the visual.
+        """
+        bvh, full = self._bvh, self._indices.buffer
+        current = self._index_buffer
+        if bvh is None or (current is not full and current is not self._culled):
+            # no culling, or a LOD level
+            return True
+        if self._clip_plane is not None:
+            self._index_buffer = full
+            return True
+        tr = view.transforms.get_transform("visual", "render")
+        changed = bvh.changed(bvh.cull(tr))
+        if not bvh.visible.any():
+            return False
+        if bvh.visible.all():
+            self._index_buffer = full
+        elif changed.shape[0] or current is full:
+            faces = bvh.visible_faces()
+            if self._culled is None:
+                self._culled = gloo.IndexBuffer(faces)
+            else:
+                self._culled.set_data(faces)
+            self._index_buffer = self._culled
+        return True
+
+    def _set_cell_data(self, points, simplices, cell_value):
+        """set_data of per-element coloring, textures are uploaded whole"""
+        if points is not None:
+            texture, shape = data_texture(points)
+            self.shared_program["u_points"] = texture
+            self.shared_program["u_points_shape"] = shape
+        if cell_value is not None:
+            texture, shape = data_texture(cell_value)
+            self.shared_program["u_cells"] = texture
+            self.shared_program["u_cells_shape"] = shape
+        if simplices is not None:
+            faces, owner = sim_owner(simplices, 3, boundary=self._mode == "boundary")
+            corners = np.empty(faces.shape + (4,), dtype=np.float32)
+            corners[..., :2] = split_ids(faces)
+            corners[..., 2:] = split_ids(owner)[:, np.newaxis]
+            # drawn without index buffer, unused rows are degenerated
+            if self._corners.set(corners.reshape(-1, 4)):
+                self.shared_program["a_corner"] = self._corners.buffer
+        self.update()
 
     def _prepare_transforms(self, view):
         """This method is called when the user or the scenegraph has assigned
@@ -127,14 +548,56 @@ class TetPlotVisual(visuals.Visual):
 
 
 def tetplot(
-    points, simplices, vertex_color=None, edge_color=None, alpha=1.0, axis=True
+    points,
+    simplices,
+    vertex_color=None,
+    edge_color=None,
+    alpha=1.0,
+    axis=True,
+    mode="triangles",
+    cache=None,
+    max_bytes=None,
+    workers=None,
+    scalar=None,
+    cmap="viridis",
+    clim=None,
+    cell_value=None,
+    lod_budget=None,
+    cull=None,
+    clip=None,
+    slice_plane=None,
+    oit=True,
+    peel_layers=8,
 ):
-    """main function for tetplot"""
+    """main function for tetplot, mode='boundary' plots the outer surface
+
+    scalar (per point) is mapped to colors by cmap and clim on the GPU,
+    cell_value (per tetrahedron, scalars or colors) colors the faces flat.
+    lod_budget (triangles per frame) draws decimated meshes while the
+    camera moves.
+    clip=(normal, offset) keeps the tetrahedra with n.x <= offset,
+    slice_plane=(normal, offset) adds the planar cut n.x = offset as a mesh.
+    oit=True draws the faces and edges with weighted blended order-independent
+    transparency (see wboit), oit='peel' with exact depth peeling of up to
+    peel_layers layers (see peeling).
+
+    cache=True uses the default TopologyCache, or pass your own instance
+    (a TetFile of tetfile serves the topology stored with the mesh).
+    max_bytes bounds the memory of the topology extraction (see topostream),
+    workers runs it on a pool of processes (see topoparallel).
+
+    points (float32) and simplices (uint32) of the right dtype are used
+    in place (points may also be a raw buffer): open a recording with
+    np.memmap(..., mode='r') to upload it in chunks without a copy.
+    """
     TetPlot = scene.visuals.create_visual_node(TetPlotVisual)
+    if cache is True:
+        cache = TopologyCache()
 
-    # convert data types for OpenGL
-    pts_float32 = points.astype(np.float32)
-    sim_uint32 = simplices.astype(np.uint32)
+    # convert data types for OpenGL, arrays of the right dtype (a np.memmap
+    # or any buffer) are not copied, see dynbuffer
+    pts_float32 = as_rows(points, np.float32, 3)
+    sim_uint32 = as_rows(simplices, np.uint32)
 
     # The real-things : plot using scene
     # build canvas
@@ -147,25 +610,68 @@ def tetplot(
     view.camera.distance = 5
 
     # toggle drawing mode
-    TetPlot(
+    faces = TetPlot(
         pts_float32,
         sim_uint32,
         vertex_color,
         color=None,
         alpha=alpha,
-        mode="triangles",
+        mode=mode,
+        cache=cache,
+        max_bytes=max_bytes,
+        workers=workers,
+        scalar=scalar,
+        cmap=cmap,
+        clim=clim,
+        cell_value=cell_value,
+        lod_budget=lod_budget,
+        cull=cull,
         parent=view.scene,
     )
+    nodes = [faces]
     if edge_color is not None:
-        TetPlot(
+        edges = TetPlot(
             pts_float32,
             sim_uint32,
             vertex_color,
             color=edge_color,
             alpha=alpha,
             mode="lines",
+            cache=cache,
+            max_bytes=max_bytes,
+            workers=workers,
+            lod_budget=lod_budget,
+            cull=cull,
             parent=view.scene,
         )
+        nodes.append(edges)
+
+    if clip is not None:
+        for node in nodes:
+            node.set_clip(*clip)
+
+    # planar cut, colored like the faces
+    if slice_plane is not None:
+        normal, offset = slice_plane
+        slicer = TetSlicer(pts_float32, sim_uint32, normal)
+        values = scalar if scalar is not None else vertex_color
+        verts, tris, vals = slicer.slice(offset, values)
+        kw = {"color": (0.8, 0.8, 0.8, 1.0)}
+        if vals is not None and scalar is not None:
+            kw = {"vertex_values": vals, "cmap": cmap}
+        elif vals is not None:
+            kw = {"vertex_colors": vals}
+        scene.visuals.Mesh(vertices=verts, faces=tris, parent=view.scene, **kw)
+
+    # order-independent transparency
+    if oit == "peel":
+        view.oit = DepthPeeling(canvas, nodes, layers=peel_layers)
+    elif oit:
+        view.oit = WeightedBlendedOIT(canvas, nodes)
+
+    # coarse levels while the camera moves
+    if lod_budget is not None:
+        view.lod = InteractiveLOD(view, nodes)
 
     # show axis
     if axis:
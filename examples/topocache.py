@@ -0,0 +1,163 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" persistent on-disk cache of derived mesh topology
+
+the faces, edges and boundary of a mesh are stored as uint32 .npy files,
+keyed by a hash of the simplices array, and memory-mapped on load.
+
+usage from the command line,
+
+    $ python topocache.py info
+    $ python topocache.py clear
+"""
+from __future__ import absolute_import
+
+import argparse
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from topology import EXTRACTORS
+from topostream import extract
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tetplot")
+DEFAULT_MAX_BYTES = 2 * 2**30
+
+
+def mesh_digest(simplices):
+    """content hash of a connectivity matrix (values, shape and dtype)"""
+    simplices = np.ascontiguousarray(simplices)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str((simplices.shape, simplices.dtype.str)).encode())
+    h.update(memoryview(simplices).cast("B"))
+    return h.hexdigest()
+
+
+class TopologyCache(object):
+    """content-addressed, size-bounded LRU cache of topology arrays"""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """initialize the cache
+
+        Parameters
+        ----------
+        path : str
+            cache directory, default to $TETPLOT_CACHE or ~/.cache/tetplot
+        max_bytes : int
+            the least recently used entries are evicted above this size
+        """
+        if path is None:
+            path = os.environ.get("TETPLOT_CACHE", DEFAULT_DIR)
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _file(self, digest, kind):
+        """file name of an entry"""
+        return os.path.join(self.path, "%s-%s.npy" % (digest, kind))
+
+    def entries(self):
+        """list of (file, size, last access), the oldest first"""
+        if not os.path.isdir(self.path):
+            return []
+        out = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".npy"):
+                continue
+            f = os.path.join(self.path, name)
+            st = os.stat(f)
+            out.append((f, st.st_size, st.st_mtime))
+        return sorted(out, key=lambda e: e[2])
+
+    def size(self):
+        """total size of the cache in bytes"""
+        return sum(e[1] for e in self.entries())
+
+    def get(self, simplices, kind="triangles", **kwargs):
+        """load or compute the topology of kind for simplices
+
+        kind is one of the keys of topology.EXTRACTORS, the returned
+        array is a read-only memory map of the cached .npy file.
+        the keyword arguments (max_bytes, workers) are passed to
+        topostream.extract on a cache miss.
+        """
+        if kind not in EXTRACTORS:
+            raise ValueError("topology kind = " + kind + " not supported")
+        f = self._file(mesh_digest(simplices), kind)
+        if os.path.exists(f):
+            # mark as recently used
+            os.utime(f, None)
+            return np.load(f, mmap_mode="r")
+
+        if kwargs.get("max_bytes") is None:
+            data = extract(simplices, kind, **kwargs)
+            self.put(f, data)
+        else:
+            # streamed to a raw file, not held in memory
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            fd, raw = tempfile.mkstemp(suffix=".raw", dir=self.path)
+            os.close(fd)
+            try:
+                data = extract(simplices, kind, out=raw, **kwargs)
+                self.put(f, data)
+                del data
+            finally:
+                os.remove(raw)
+        self.evict()
+        if not os.path.exists(f):
+            return data
+        return np.load(f, mmap_mode="r")
+
+    def put(self, f, data):
+        """write an entry atomically"""
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.save(fh, data)
+            os.replace(tmp, f)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def evict(self):
+        """remove the least recently used entries until size <= max_bytes"""
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for f, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(f)
+            total -= size
+
+    def clear(self):
+        """remove all entries"""
+        for f, _, _ in self.entries():
+            os.remove(f)
+
+
+def main():
+    """inspect or clear the cache"""
+    parser = argparse.ArgumentParser(description="tetplot topology cache")
+    parser.add_argument("command", choices=["info", "clear"])
+    parser.add_argument("--path", default=None, help="cache directory")
+    args = parser.parse_args()
+
+    cache = TopologyCache(args.path)
+    if args.command == "clear":
+        n = len(cache.entries())
+        cache.clear()
+        print("removed %d entries from %s" % (n, cache.path))
+    else:
+        entries = cache.entries()
+        for f, size, _ in entries[::-1]:
+            print("%10.1f MB  %s" % (size / 2**20, os.path.basename(f)))
+        total = sum(e[1] for e in entries)
+        print("%d entries, %.1f MB in %s" % (len(entries), total / 2**20, cache.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" vectorized face and edge extraction for unstructured meshes """
+from __future__ import absolute_import
+
+import numpy as np
+
+# local vertex tables, the rows of a simplex table are in increasing order,
+# so once a simplex is sorted every local face is sorted as well
+TRI_EDGES = np.array([(0, 1), (0, 2), (1, 2)])
+TET_FACES = np.array([(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)])
+TET_EDGES = np.array([(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+
+# hexahedron in VTK ordering, faces are quads (cyclic order is kept)
+HEX_FACES = np.array(
+    [
+        (0, 3, 2, 1),
+        (4, 5, 6, 7),
+        (0, 1, 5, 4),
+        (1, 2, 6, 5),
+        (2, 3, 7, 6),
+        (3, 0, 4, 7),
+    ]
+)
+HEX_EDGES = np.array(
+    [
+        (0, 1),
+        (1, 2),
+        (2, 3),
+        (3, 0),
+        (4, 5),
+        (5, 6),
+        (6, 7),
+        (7, 4),
+        (0, 4),
+        (1, 5),
+        (2, 6),
+        (3, 7),
+    ]
+)
+
+SIMPLEX_TABLES = {
+    (2, 2): np.array([(0, 1)]),
+    (3, 2): TRI_EDGES,
+    (3, 3): np.array([(0, 1, 2)]),
+    (4, 2): TET_EDGES,
+    (4, 3): TET_FACES,
+    (4, 4): np.array([(0, 1, 2, 3)]),
+}
+
+
+def _fits_uint64(n, N):
+    """check if N indices in [0, n) can be packed into one uint64 key"""
+    return int(n) ** N <= 2**64
+
+
+def _pack(columns, n):
+    """pack sorted index columns into uint64 keys, key = (a*n + b)*n + c"""
+    key = np.zeros(columns[0].shape[0], dtype=np.uint64)
+    base = np.uint64(n)
+    for c in columns:
+        key *= base
+        key += c.astype(np.uint64)
+    return key
+
+
+def _pack_wide(columns, n):
+    """pack sorted index columns into 16 byte keys when uint64 overflows
+
+    a key is (hi, lo) big-endian, lo packs the last two columns and hi the
+    others (n <= 2**32), so the byte order of the void keys is the order
+    of the tuples: sort, argsort, searchsorted and != work as on uint64.
+    """
+    m = columns[0].shape[0]
+    pair = np.empty((m, 2), dtype=">u8")
+    pair[:, 0] = _pack(columns[:-2], n) if len(columns) > 2 else 0
+    pair[:, 1] = _pack(columns[-2:], n)
+    return pair.view("V16").ravel()
+
+
+def pack_keys(columns, n):
+    """uint64 keys of sorted index columns, 16 byte keys if they overflow"""
+    if _fits_uint64(n, len(columns)):
+        return _pack(columns, n)
+    return _pack_wide(columns, n)
+
+
+def unpack_keys(key, n, N):
+    """inverse of pack_keys, returns (len(key) x N) uint32 indices"""
+    if key.dtype == np.uint64:
+        return _unpack(key, n, N)
+    pair = np.frombuffer(np.ascontiguousarray(key).tobytes(), dtype=">u8")
+    pair = pair.reshape(-1, 2).astype(np.uint64)
+    out = np.empty((key.shape[0], N), dtype=np.uint32)
+    out[:, N - 2 :] = _unpack(pair[:, 1], n, 2)
+    if N > 2:
+        out[:, : N - 2] = _unpack(pair[:, 0], n, N - 2)
+    return out
+
+
+def _unpack(key, n, N):
+    """inverse of _pack, returns (len(key) x N) uint32 indices"""
+    out = np.empty((key.shape[0], N), dtype=np.uint32)
+    key = key.copy()
+    base = np.uint64(n)
+    for j in range(N - 1, -1, -1):
+        out[:, j] = key % base
+        key //= base
+    return out
+
+
+def sorted_keys(simplices, table, n=None):
+    """packed and sorted (with duplicates) keys of the local faces
+
+    Parameters
+    ----------
+    simplices : NDArray
+        M x K connectivity matrix
+    table : NDArray
+        F x N local vertex table, rows in increasing order
+    n : int
+        number of points, default to simplices.max() + 1
+
+    Returns
+    -------
+    key : NDArray of uint64
+        M*F sorted keys, a face shared by k simplices appears k times
+    """
+    if n is None:
+        n = int(simplices.max()) + 1
+    sim = np.sort(simplices, axis=1)
+    M, (F, _) = sim.shape[0], table.shape
+    key = np.empty(M * F, dtype=np.uint64)
+    for i, face in enumerate(table):
+        key[i * M : (i + 1) * M] = _pack([sim[:, j] for j in face], n)
+    key.sort()
+    return key
+
+
+def _unique_sorted(key):
+    """unique entries of a sorted key array"""
+    if key.shape[0] == 0:
+        return key
+    mask = np.empty(key.shape[0], dtype=bool)
+    mask[0] = True
+    np.not_equal(key[1:], key[:-1], out=mask[1:])
+    return key[mask]
+
+
+def _run_length(change):
+    """start index and length of runs, change[i] is True if item i+1 != i"""
+    mask = np.empty(change.shape[0] + 2, dtype=bool)
+    mask[0], mask[-1] = True, True
+    mask[1:-1] = change
+    bounds = np.flatnonzero(mask)
+    return bounds[:-1], np.diff(bounds)
+
+
+def _unique_rows(rows, sort_rows=True):
+    """lexsort based dedupe, used when the keys do not fit into uint64"""
+    s = np.sort(rows, axis=1) if sort_rows else rows
+    order = np.lexsort(s.T[::-1])
+    s = s[order]
+    mask = np.ones(s.shape[0], dtype=bool)
+    mask[1:] = np.any(s[1:] != s[:-1], axis=1)
+    return rows[order[mask]]
+
+
+def sim_conv(simplices, N=3, workers=None):
+    """simplices to any dimension
+
+    Parameters
+    ----------
+    simplices : NDArray
+        M x K connectivity matrix (triangles K=3, tetrahedra K=4)
+    N : int
+        number of vertices of the extracted entity, 3 for triangles,
+        2 for edges
+    workers : int
+        if > 1, run on a process pool (see topoparallel)
+
+    Returns
+    -------
+    NDArray of uint32
+        unique (sorted) N-tuples in lexicographical order
+    """
+    simplices = np.asarray(simplices)
+    K = simplices.shape[1]
+    table = SIMPLEX_TABLES.get((K, N))
+    if table is None:
+        raise ValueError("simplex of %d points to %d not supported" % (K, N))
+    if simplices.shape[0] == 0:
+        return np.empty((0, N), dtype=np.uint32)
+
+    n = int(simplices.max()) + 1
+    if workers is not None and workers > 1:
+        from topoparallel import parallel_conv
+
+        return parallel_conv(simplices, N, workers)
+    if _fits_uint64(n, N):
+        key = _unique_sorted(sorted_keys(simplices, table, n))
+        return _unpack(key, n, N)
+
+    # fallback, materialize the rows and lexsort them
+    sim = np.sort(simplices, axis=1).astype(np.uint32)
+    t = sim[:, table].reshape(-1, N)
+    return _unique_rows(t, sort_rows=False)
+
+
+def sim_boundary(simplices, N=3, workers=None):
+    """N-tuples referenced by exactly one simplex
+
+    for tetrahedra (N=3) these are the faces of the outer surface,
+    for triangles (N=2) the edges of the boundary.
+    """
+    simplices = np.asarray(simplices)
+    K = simplices.shape[1]
+    table = SIMPLEX_TABLES.get((K, N))
+    if table is None:
+        raise ValueError("simplex of %d points to %d not supported" % (K, N))
+    if simplices.shape[0] == 0:
+        return np.empty((0, N), dtype=np.uint32)
+
+    n = int(simplices.max()) + 1
+    if workers is not None and workers > 1:
+        from topoparallel import parallel_conv
+
+        return parallel_conv(simplices, N, workers, boundary=True)
+    if _fits_uint64(n, N):
+        key = sorted_keys(simplices, table, n)
+        start, count = _run_length(key[1:] != key[:-1])
+        return _unpack(key[start[count == 1]], n, N)
+
+    # fallback, count the runs of lexsorted rows
+    sim = np.sort(simplices, axis=1).astype(np.uint32)
+    t = sim[:, table].reshape(-1, N)
+    t = t[np.lexsort(t.T[::-1])]
+    start, count = _run_length(np.any(t[1:] != t[:-1], axis=1))
+    return t[start[count == 1]]
+
+
+def sim_owner(simplices, N=3, boundary=False):
+    """unique N-tuples and the index of a simplex owning each of them
+
+    the owner maps a face back to its tetrahedron, it is used to color
+    faces by per-element values. an interior face is owned by one of
+    its two tetrahedra, a boundary face by its only one.
+
+    Returns
+    -------
+    t : NDArray of uint32
+        unique (sorted) N-tuples in lexicographical order
+    owner : NDArray of uint32
+        index into simplices of every row of t
+    """
+    simplices = np.asarray(simplices)
+    M, K = simplices.shape
+    table = SIMPLEX_TABLES.get((K, N))
+    if table is None:
+        raise ValueError("simplex of %d points to %d not supported" % (K, N))
+    if M == 0:
+        return np.empty((0, N), dtype=np.uint32), np.empty(0, dtype=np.uint32)
+    t, order, start, count = face_runs(simplices, table)
+    if boundary:
+        t, start = t[count == 1], start[count == 1]
+    return t, (order[start] % M).astype(np.uint32)
+
+
+def face_runs(simplices, table, n=None):
+    """local faces of the simplices grouped by N-tuple
+
+    Returns
+    -------
+    t : NDArray of uint32
+        unique (sorted) N-tuples in lexicographical order
+    order : NDArray of int
+        stable sort of the M*F local faces, face i belongs to simplex i % M
+    start, count : NDArray of int
+        the faces of t[i] are order[start[i] : start[i] + count[i]]
+    """
+    N = table.shape[1]
+    if n is None:
+        n = int(simplices.max()) + 1
+    sim = np.sort(simplices, axis=1)
+    # uint64 keys, or 16 byte keys if n**N overflows (see pack_keys)
+    key = np.concatenate([pack_keys([sim[:, j] for j in face], n) for face in table])
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    start, count = _run_length(key[1:] != key[:-1])
+    return unpack_keys(key[start], n, N), order, start, count
+
+
+def sim2tri(simplices, workers=None):
+    """convert simplices of high dimension to indices of triangles"""
+    return sim_conv(simplices, 3, workers)
+
+
+def sim2edge(simplices, workers=None):
+    """convert simplices of high dimension to indices of edges"""
+    return sim_conv(simplices, 2, workers)
+
+
+def sim2boundary(simplices, workers=None):
+    """convert tetrahedra to indices of the triangles on the boundary"""
+    return sim_boundary(simplices, 3, workers)
+
+
+# extracted topology by TetPlotVisual drawing mode
+EXTRACTORS = {
+    "triangles": sim2tri,
+    "boundary": sim2boundary,
+    "lines": sim2edge,
+}
+
+
+def hex2quad(hexahedra):
+    """unique quads of hexahedra, the cyclic order of vertices is kept"""
+    hexahedra = np.asarray(hexahedra, dtype=np.uint32)
+    q = hexahedra[:, HEX_FACES].reshape(-1, 4)
+    return _unique_rows(q)
+
+
+def hex2edge(hexahedra):
+    """unique (sorted) edges of hexahedra"""
+    hexahedra = np.asarray(hexahedra, dtype=np.uint32)
+    e = np.sort(hexahedra[:, HEX_EDGES].reshape(-1, 2), axis=1)
+    return sim_conv(e, 2) if e.shape[0] else e
+
+
+def quad2tri(quads):
+    """split quads into two triangles each"""
+    quads = np.asarray(quads, dtype=np.uint32)
+    return quads[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 3)
+
+
+def tet_box(nx, ny=None, nz=None):
+    """structured box mesh of a unit cube, each cell is split into 6 tets
+
+    it is mainly used by the benchmarks, where a mesh with realistic
+    face sharing is needed, the number of tetrahedra is 6*nx*ny*nz.
+    """
+    ny = nx if ny is None else ny
+    nz = nx if nz is None else nz
+    x, y, z = np.meshgrid(
+        np.linspace(0, 1, nx + 1),
+        np.linspace(0, 1, ny + 1),
+        np.linspace(0, 1, nz + 1),
+        indexing="ij",
+    )
+    points = np.c_[x.ravel(), y.ravel(), z.ravel()].astype(np.float32)
+
+    # index of the (0, 0, 0) corner of every cell
+    i, j, k = np.meshgrid(np.arange(nx), np.arange(ny), np.arange(nz), indexing="ij")
+    v0 = ((i * (ny + 1) + j) * (nz + 1) + k).ravel()
+    di, dj, dk = (ny + 1) * (nz + 1), nz + 1, 1
+
+    # Freudenthal split, one tetrahedron per path from (0,0,0) to (1,1,1)
+    paths = [
+        (di, dj, dk),
+        (di, dk, dj),
+        (dj, di, dk),
+        (dj, dk, di),
+        (dk, di, dj),
+        (dk, dj, di),
+    ]
+    tets = []
+    for a, b, c in paths:
+        tets.append(np.c_[v0, v0 + a, v0 + a + b, v0 + a + b + c])
+    simplices = np.vstack(tets).astype(np.uint32)
+
+    return points, simplices
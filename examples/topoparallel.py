@@ -0,0 +1,187 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" multi-core face and edge extraction with a process pool
+
+the simplices and the packed keys live in shared memory, so the workers
+never receive a pickled copy of the mesh.
+
+  1. map : every worker packs and sorts the keys of a block of rows, and
+     cuts them at splitters sampled from the key distribution,
+  2. reduce : every worker dedupes one key range gathered from all blocks,
+     and writes the unpacked tuples to a shared output buffer.
+
+the key ranges are ordered, so the concatenated result is sorted as in
+topology.sim_conv. the keys are uint64, or 16 byte keys when n**N does not
+fit (see topology.pack_keys), both sort and cut the same way.
+"""
+from __future__ import absolute_import
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import os
+
+import numpy as np
+
+from topology import (
+    SIMPLEX_TABLES,
+    _fits_uint64,
+    _run_length,
+    pack_keys,
+    unpack_keys,
+)
+
+# number of simplices sampled to pick the splitters of the key ranges
+SAMPLE_SIZE = 65536
+
+
+def _create(shape, dtype):
+    """allocate a numpy array in a new shared memory block"""
+    nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = SharedMemory(create=True, size=nbytes)
+    return shm, np.ndarray(shape, dtype, buffer=shm.buf)
+
+
+def _attach(spec):
+    """attach to a shared array, spec = (name, shape, dtype)"""
+    name, shape, dtype = spec
+    shm = SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype, buffer=shm.buf)
+
+
+def _keys(sim, table, n):
+    """packed keys of the local faces of (sorted) simplices"""
+    return np.concatenate([pack_keys([sim[:, j] for j in face], n) for face in table])
+
+
+def _map(sim_spec, key_spec, table, n, start, stop, splitters):
+    """pack and sort the keys of rows [start, stop), return the cut points"""
+    shm_s, sim = _attach(sim_spec)
+    shm_k, key = _attach(key_spec)
+    k = None
+    try:
+        F = table.shape[0]
+        k = key[start * F : stop * F]
+        k[:] = _keys(np.sort(sim[start:stop], axis=1), table, n)
+        k.sort()
+        return np.searchsorted(k, splitters)
+    finally:
+        del sim, key, k
+        shm_s.close()
+        shm_k.close()
+
+
+def _reduce(key_spec, out_spec, segments, offset, n, N, boundary):
+    """dedupe the keys of one range, write the tuples at out[offset:]"""
+    shm_k, key = _attach(key_spec)
+    shm_o, out = _attach(out_spec)
+    try:
+        k = np.concatenate([key[lo:hi] for lo, hi in segments])
+        if k.shape[0] == 0:
+            return 0
+        k.sort()
+        start, count = _run_length(k[1:] != k[:-1])
+        if boundary:
+            start = start[count == 1]
+        out[offset : offset + start.shape[0]] = unpack_keys(k[start], n, N)
+        return start.shape[0]
+    finally:
+        del key, out
+        shm_k.close()
+        shm_o.close()
+
+
+def _splitters(sim, table, n, parts):
+    """key values cutting a random sample into equally sized ranges"""
+    M = sim.shape[0]
+    rows = np.random.default_rng(0).integers(0, M, min(M, SAMPLE_SIZE))
+    sample = np.sort(_keys(np.sort(sim[rows], axis=1), table, n))
+    return sample[(np.arange(1, parts) * sample.shape[0]) // parts]
+
+
+def parallel_conv(simplices, N=3, workers=None, boundary=False, shm_name=None):
+    """parallel counterpart of topology.sim_conv and topology.sim_boundary
+
+    Parameters
+    ----------
+    simplices : NDArray
+        M x K connectivity matrix
+    N : int
+        3 for triangles, 2 for edges
+    workers : int
+        number of processes, default to os.cpu_count()
+    boundary : bool
+        keep only the tuples referenced by exactly one simplex
+    shm_name : str
+        name of a SharedMemory block that simplices (C-contiguous uint32)
+        is a view of, the workers attach to it. by default simplices are
+        copied to a new block, which doubles their peak memory.
+
+    Returns
+    -------
+    NDArray of uint32
+        unique (sorted) N-tuples in lexicographical order
+    """
+    simplices = np.asarray(simplices)
+    M, K = simplices.shape
+    table = SIMPLEX_TABLES.get((K, N))
+    if table is None:
+        raise ValueError("simplex of %d points to %d not supported" % (K, N))
+    if M == 0:
+        return np.empty((0, N), dtype=np.uint32)
+    if shm_name is not None and (
+        simplices.dtype != np.uint32 or not simplices.flags.c_contiguous
+    ):
+        raise ValueError("shared simplices must be C-contiguous uint32")
+    n = int(simplices.max()) + 1
+    kdtype = np.uint64 if _fits_uint64(n, N) else np.dtype("V16")
+    workers = workers or os.cpu_count()
+    F = table.shape[0]
+
+    shm, sim, out = [], simplices, None
+    try:
+        if shm_name is None:
+            # copy, the workers attach to the block instead of a pickle
+            s, sim = _create((M, K), np.uint32)
+            shm.append(s)
+            sim[:] = simplices
+            shm_name = s.name
+        s, _ = _create((M * F,), kdtype)
+        shm.append(s)
+        key_spec = (s.name, (M * F,), kdtype)
+        s, out = _create((M * F, N), np.uint32)
+        shm.append(s)
+        out_spec = (s.name, (M * F, N), np.uint32)
+        sim_spec = (shm_name, (M, K), np.uint32)
+
+        splitters = _splitters(sim, table, n, workers)
+        bounds = np.linspace(0, M, workers + 1).astype(int)
+        blocks = list(zip(bounds[:-1], bounds[1:]))
+        with ProcessPoolExecutor(workers) as ex:
+            # map, blocks of rows
+            futures = [
+                ex.submit(_map, sim_spec, key_spec, table, n, lo, hi, splitters)
+                for lo, hi in blocks
+            ]
+            cuts = [
+                np.r_[0, f.result(), (hi - lo) * F] + lo * F
+                for (lo, hi), f in zip(blocks, futures)
+            ]
+
+            # reduce, ranges of keys
+            futures, offsets, offset = [], [], 0
+            for p in range(workers):
+                segments = [(c[p], c[p + 1]) for c in cuts]
+                args = (key_spec, out_spec, segments, offset, n, N, boundary)
+                futures.append(ex.submit(_reduce, *args))
+                offsets.append(offset)
+                offset += sum(hi - lo for lo, hi in segments)
+            counts = [f.result() for f in futures]
+
+        # compact the ranges, this is the only copy out of shared memory
+        return np.concatenate([out[o : o + c] for o, c in zip(offsets, counts)])
+    finally:
+        # the views must be released before the blocks are closed
+        del sim, out
+        for s in shm:
+            s.close()
+            s.unlink()
@@ -0,0 +1,223 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" streaming face and edge extraction for meshes larger than RAM
+
+simplices are read block by block (from a memory-mapped .npy or any
+iterator of blocks), the packed keys of every block are deduped locally
+and spilled to sorted runs on disk, which are then merged in bounded
+windows. the peak memory is about max_bytes. the keys are uint64, or 16
+byte keys above about 2.6M points (see topology.pack_keys), and the
+result can be written to a file (out) instead of memory.
+"""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from topology import EXTRACTORS, SIMPLEX_TABLES, _run_length, pack_keys, unpack_keys
+
+DEFAULT_MAX_BYTES = 2**30
+
+
+def iter_blocks(simplices, rows):
+    """yield blocks of rows of a (memory-mapped) connectivity matrix"""
+    for i in range(0, simplices.shape[0], rows):
+        yield np.asarray(simplices[i : i + rows])
+
+
+def num_points(simplices, rows=2**22):
+    """max index + 1, computed block by block"""
+    n = 0
+    for block in iter_blocks(simplices, rows):
+        n = max(n, int(block.max()) + 1)
+    return n
+
+
+def _dedupe(key, count):
+    """sort keys and sum the counts of equal keys"""
+    order = np.argsort(key, kind="stable")
+    key, count = key[order], count[order]
+    if key.shape[0] == 0:
+        return key, count
+    start, _ = _run_length(key[1:] != key[:-1])
+    return key[start], np.add.reduceat(count, start).astype(np.uint32)
+
+
+def _block_keys(block, table, n):
+    """unique packed keys (with counts) of the local faces of a block"""
+    sim = np.sort(block, axis=1)
+    key = np.concatenate([pack_keys([sim[:, j] for j in face], n) for face in table])
+    key.sort()
+    if key.shape[0] == 0:
+        return key, np.empty(0, dtype=np.uint32)
+    start, count = _run_length(key[1:] != key[:-1])
+    return key[start], count.astype(np.uint32)
+
+
+class _Runs(object):
+    """sorted runs of (key, count) spilled to a temporary directory"""
+
+    def __init__(self, tmpdir=None):
+        self.path = tempfile.mkdtemp(prefix="topostream-", dir=tmpdir)
+        self.files = []
+
+    def spill(self, key, count):
+        """write one sorted run"""
+        f = os.path.join(self.path, "run%05d" % len(self.files))
+        np.save(f + "-key.npy", key)
+        np.save(f + "-count.npy", count)
+        self.files.append(f)
+
+    def open(self):
+        """memory-mapped (key, count) of all runs"""
+        return [
+            (
+                np.load(f + "-key.npy", mmap_mode="r"),
+                np.load(f + "-count.npy", mmap_mode="r"),
+            )
+            for f in self.files
+        ]
+
+    def close(self):
+        """remove the temporary files"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _merge(runs, window):
+    """k-way merge of sorted runs, yields blocks of unique (key, count)
+
+    in every step a window is read from each run, and only the keys up to
+    the smallest window tail are merged, so no key straddles two steps.
+    """
+    pos = [0] * len(runs)
+    while True:
+        active = [i for i, (k, _) in enumerate(runs) if pos[i] < k.shape[0]]
+        if not active:
+            return
+        tails = []
+        for i in active:
+            k = runs[i][0]
+            end = pos[i] + window
+            if end < k.shape[0]:
+                tails.append(np.asarray(k[end - 1 : end]))
+        # the smallest tail, a sort also orders the 16 byte keys
+        lim = np.sort(np.concatenate(tails))[0] if tails else None
+        keys, counts = [], []
+        for i in active:
+            k, c = runs[i]
+            w = np.asarray(k[pos[i] : pos[i] + window])
+            cut = w.shape[0] if lim is None else np.searchsorted(w, lim, "right")
+            keys.append(w[:cut])
+            counts.append(np.asarray(c[pos[i] : pos[i] + cut]))
+            pos[i] += cut
+        yield _dedupe(np.concatenate(keys), np.concatenate(counts))
+
+
+def stream_conv(
+    blocks, n, N=3, boundary=False, max_bytes=DEFAULT_MAX_BYTES, tmpdir=None, out=None
+):
+    """unique N-tuples of a stream of simplex blocks
+
+    Parameters
+    ----------
+    blocks : iterable of NDArray
+        blocks of the M x K connectivity matrix, see iter_blocks
+    n : int
+        number of points (max index + 1)
+    N : int
+        3 for triangles, 2 for edges
+    boundary : bool
+        keep only the tuples referenced by exactly one simplex
+    max_bytes : int
+        memory budget, the blocks should be about max_bytes / (20*K) rows
+    tmpdir : str
+        directory of the spilled runs
+    out : str
+        if given, the result is written to this raw uint32 file and
+        returned as a np.memmap, otherwise it is returned in memory
+
+    Returns
+    -------
+    NDArray of uint32
+        unique (sorted) N-tuples in lexicographical order
+    """
+    runs = _Runs(tmpdir)
+    try:
+        # local dedupe, buffer block results and spill when over budget
+        buf_key, buf_count, buf_bytes = [], [], 0
+        for block in blocks:
+            table = SIMPLEX_TABLES.get((block.shape[1], N))
+            if table is None:
+                raise ValueError("simplex of %d points not supported" % block.shape[1])
+            key, count = _block_keys(block, table, n)
+            buf_key.append(key)
+            buf_count.append(count)
+            buf_bytes += (key.itemsize + 4) * key.shape[0]
+            if buf_bytes > max_bytes // 4:
+                runs.spill(*_dedupe(np.concatenate(buf_key), np.concatenate(buf_count)))
+                buf_key, buf_count, buf_bytes = [], [], 0
+        if buf_key:
+            runs.spill(*_dedupe(np.concatenate(buf_key), np.concatenate(buf_count)))
+
+        # external merge, each merge step holds about 3 windows per run
+        window = max(1024, max_bytes // (3 * 20 * max(1, len(runs.files))))
+        fh = open(out, "wb") if out is not None else None
+        result, total = [], 0
+        try:
+            for key, count in _merge(runs.open(), window):
+                if boundary:
+                    key = key[count == 1]
+                t = unpack_keys(key, n, N)
+                total += t.shape[0]
+                if fh is None:
+                    result.append(t)
+                else:
+                    t.tofile(fh)
+        finally:
+            if fh is not None:
+                fh.close()
+    finally:
+        runs.close()
+
+    if out is not None:
+        if total == 0:
+            return np.empty((0, N), dtype=np.uint32)
+        return np.memmap(out, dtype=np.uint32, mode="r", shape=(total, N))
+    if not result:
+        return np.empty((0, N), dtype=np.uint32)
+    return np.concatenate(result)
+
+
+def stream_extract(simplices, mode="triangles", max_bytes=DEFAULT_MAX_BYTES, **kwargs):
+    """chunked counterpart of topology.EXTRACTORS[mode](simplices)
+
+    simplices may be a np.memmap (e.g. np.load(f, mmap_mode='r')),
+    the block size is derived from max_bytes.
+    """
+    if mode not in ("triangles", "boundary", "lines"):
+        raise ValueError("Drawing mode = " + mode + " not supported")
+    N = 2 if mode == "lines" else 3
+    K = simplices.shape[1]
+    rows = max(1024, max_bytes // (40 * K))
+    n = num_points(simplices, rows)
+    blocks = iter_blocks(simplices, rows)
+    return stream_conv(
+        blocks, n, N, boundary=(mode == "boundary"), max_bytes=max_bytes, **kwargs
+    )
+
+
+def extract(simplices, mode="triangles", max_bytes=None, workers=None, out=None):
+    """extract the topology of a drawing mode
+
+    the extraction is done in chunks if max_bytes is set, otherwise on
+    a pool of processes if workers > 1. with max_bytes, out (a file name)
+    receives the result, returned as a np.memmap (see stream_conv).
+    """
+    if mode not in EXTRACTORS:
+        raise ValueError("Drawing mode = " + mode + " not supported")
+    if max_bytes is None:
+        return EXTRACTORS[mode](simplices, workers)
+    return stream_extract(simplices, mode, max_bytes, out=out)
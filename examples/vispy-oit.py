@@ -5,6 +5,8 @@ from vispy import app, gloo
 from vispy.gloo import gl
 from vispy.util.transforms import translate, perspective, rotate
 
+from rendertarget import default_pool
+
 vert_quads = """
 uniform mat4 u_model;         // Model matrix
 uniform mat4 u_view;          // View matrix
@@ -46,13 +48,14 @@ void main()
 """
 
 vert_post = """
+uniform vec2 u_scale;
 attribute vec2 a_position;
 varying vec2 v_texcoord;
 
 void main(void)
 {
     gl_Position = vec4(a_position, 0, 1);
-    v_texcoord = (a_position + 1.0)/2.0;
+    v_texcoord = (a_position + 1.0)/2.0 * u_scale;
 }
 """
 
@@ -88,20 +91,9 @@ class Canvas(app.Canvas):
             self, size=(512, 512), title="scaling quad", keys="interactive"
         )
 
-        # RGBA32F float texture size[0]=height, size[1]=width
-        a = np.zeros((self.size[0], self.size[1], 4), np.float32)
-        accum_texture = gloo.Texture2D(a)
-
-        # R32F float texture
-        b = np.zeros((self.size[0], self.size[1]), np.float32)
-        reveal_texture = gloo.Texture2D(b)
-
-        self.accum = accum_texture
-        self.reveal = reveal_texture
-
-        # Framebuffer with two color targets
-        framebuffer = gloo.FrameBuffer(color=self.accum)
-        self.framebuffer = framebuffer
+        # RGBA32F and R32F float textures are taken from a pool at the
+        # physical size of the canvas at every draw, see on_draw
+        self.pool = default_pool
 
         #
         quads = gloo.Program(vert_quads, frag_quads, count=12)
@@ -132,8 +124,6 @@ class Canvas(app.Canvas):
 
         # Post composition
         post = gloo.Program(vert_post, frag_post)
-        post["tex_accumulation"] = self.accum
-        post["tex_revealage"] = self.reveal
         post["a_position"] = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
 
         # intialize transformation matrix
@@ -169,10 +159,10 @@ class Canvas(app.Canvas):
         self.show()
 
     def on_resize(self, event):
-        """canvas resize callback"""
+        """canvas resize callback, the render targets follow in on_draw"""
         gloo.set_viewport(0, 0, *event.physical_size)
-        # ratio = event.physical_size[0] / float(event.physical_size[1])
-        # self.quads['u_projection'] = perspective(50.0, ratio, 0.1, 100.0)
+        ratio = event.physical_size[0] / float(event.physical_size[1])
+        self.quads["u_projection"] = perspective(50.0, ratio, 0.1, 100.0)
 
     def on_draw(self, event):
         """canvas update callback"""
@@ -187,21 +177,26 @@ class Canvas(app.Canvas):
         # gl.glDepthMask(gl.GL_FALSE)
         # gl.glEnable(gl.GL_BLEND)
 
+        # render targets, reallocated only when the size class changes
+        w, h = self.physical_size
+        accum = self.pool.acquire(self, (w, h), "rgba32f")
+        reveal = self.pool.acquire(self, (w, h), "r32f")
+
         #
         self.quads["u_pass"] = 0.0
-        self.framebuffer.color_buffer = self.accum
-        self.framebuffer.activate()
+        accum.fbo.activate()
+        gloo.set_viewport(0, 0, w, h)
         gloo.clear(color=(0, 0, 0, 0))
         # gloo.set_blend_func('one', 'one')
         # gl.glBlendFunc(gl.GL_ONE, gl.GL_ONE)
         gl.glBlendFuncSeparate(gl.GL_ONE, gl.GL_ONE, gl.GL_ONE, gl.GL_ONE)
         self.quads.draw("triangles", self.indices)
-        self.framebuffer.deactivate()
+        accum.fbo.deactivate()
 
         #
         self.quads["u_pass"] = 1.0
-        self.framebuffer.color_buffer = self.reveal
-        self.framebuffer.activate()
+        reveal.fbo.activate()
+        gloo.set_viewport(0, 0, w, h)
         gloo.clear(color=(1, 1, 1, 1))
         # gloo.set_blend_func('zero', 'one_minus_src_color')
         # gl.glBlendFunc(gl.GL_ZERO, gl.GL_ONE_MINUS_SRC_COLOR)
@@ -209,7 +204,8 @@ class Canvas(app.Canvas):
             gl.GL_ZERO, gl.GL_ONE_MINUS_SRC_COLOR, gl.GL_ZERO, gl.GL_ONE_MINUS_SRC_COLOR
         )
         self.quads.draw("triangles", self.indices)
-        self.framebuffer.deactivate()
+        reveal.fbo.deactivate()
+        gloo.set_viewport(0, 0, w, h)
 
         # Filled cube
         # gloo.set_blend_func('src_alpha', 'one_minus_src_alpha')
@@ -220,7 +216,12 @@ class Canvas(app.Canvas):
             gl.GL_ONE_MINUS_SRC_ALPHA,
         )
         # gloo.set_state('translucent', blend=True, depth_test=False)
-        self.post.draw("triangle_strip", self.indices)
+        self.post["tex_accumulation"] = accum.texture
+        self.post["tex_revealage"] = reveal.texture
+        self.post["u_scale"] = accum.scale
+        self.post.draw("triangle_strip")
+        self.pool.release(accum)
+        self.pool.release(reveal)
 
 
 # Finally, we show the canvas and we run the application.
@@ -0,0 +1,332 @@
+# coding: utf-8
+# pylint: disable=invalid-name
+""" weighted blended order-independent transparency for vispy scenes
+
+the technique of McGuire and Bavoil (http://jcgt.org/published/0002/02/09/)
+hand-wired in vispy-oit.py and oit.py, packaged for any visual of a
+SceneCanvas (TetPlotVisual, MeshVisual, ...):
+
+    oit = WeightedBlendedOIT(canvas)
+    oit.add(mesh)
+
+the visuals added to the pass are skipped by the normal scene draw, after
+the scene (the opaque visuals) they are drawn into float textures and a
+screen quad composes the weighted average color over the scene with the
+alpha 1 - revealage. the fragments are weighted in a filter attached to
+the visuals, w decreases with the window depth, so the result does not
+depend on the draw order.
+
+two paths are available, chosen when the pass is created:
+
+'mrt' : one geometry pass with multiple render targets, as oit.py, the
+    visual writes gl_FragData[0] (sum(rgb * a * w), prod(1 - a)) and
+    gl_FragData[1] (sum(a * w)), with a single blend function
+    (ONE, ONE) for colors and (ZERO, ONE_MINUS_SRC_ALPHA) for alpha.
+    gloo only knows single target framebuffers, the second attachment
+    and glDrawBuffers are set with PyOpenGL (optional).
+'two-pass' : as vispy-oit.py, the geometry is drawn twice,
+    accumulation (RGBA32F), blend ONE, ONE : sum(rgb * a * w, a * w)
+    revealage (R32F), blend ZERO, ONE_MINUS_SRC_COLOR : prod(1 - a)
+
+the float textures are taken from a RenderTargetPool (see rendertarget)
+at the physical size of the canvas at every draw. translucent visuals
+are not occluded by the opaque ones (the depth buffer of the canvas is
+not shared).
+"""
+from __future__ import absolute_import
+
+import numpy as np
+from vispy import gloo
+from vispy.visuals.filters import Filter
+from vispy.visuals.shaders import Function
+
+from oitpass import OITPass
+
+try:
+    from OpenGL import GL
+except ImportError:
+    GL = None
+
+# weighting of the fragments, equation (10) of McGuire and Bavoil
+# with the window depth z = gl_FragCoord.z in [0, 1], WMAX bounds the
+# weights to the range of the accumulation format
+weight_depth = """
+float wboit_weight(float a, float z)
+{
+    return a * clamp(WMAX * pow(1.0 - z, 3.0), 1e-2, WMAX);
+}
+"""
+
+# precision : (accumulation, revealage, WMAX)
+# float16 saturates at 65504, a maximum weight of 3e2 lets ~200 opaque
+# layers accumulate (3e3 only ~20). the r8 revealage stores prod(1 - a)
+# in 1/255 steps, it is only used by the two-pass path, the MRT path
+# accumulates the weights in the second target and keeps r16f.
+PRECISIONS = {
+    "float32": ("rgba32f", "r32f", 3e3),
+    "float16": ("rgba16f", "r16f", 3e2),
+    "float16-r8": ("rgba16f", "r8", 3e2),
+}
+
+# two-pass, the color of the visual is rewritten in gl_FragColor
+frag_weight = """
+void wboit_two_pass()
+{
+    // $pass < 0 : not in the OIT pass, the visual draws as usual
+    if ($pass < -0.5)
+        return;
+    float a = gl_FragColor.a;
+    float w = $weight(a, gl_FragCoord.z);
+    if ($pass < 0.5)
+        gl_FragColor = vec4(gl_FragColor.rgb * a, a) * w;
+    else
+        gl_FragColor = vec4(a);
+}
+"""
+
+# single pass, gl_FragColor is replaced by gl_FragData[0] in every function
+# of the fragment shader (the visual and its other filters), a shader may
+# not write both gl_FragColor and gl_FragData
+frag_weight_mrt = """
+void wboit_mrt()
+{
+    if ($pass < -0.5)
+        return;
+    vec4 color = gl_FragData[0];
+    float a = color.a;
+    float w = $weight(a, gl_FragCoord.z);
+    gl_FragData[0] = vec4(color.rgb * a * w, a);
+    gl_FragData[1] = vec4(a * w);
+}
+"""
+
+vert_compose = """
+uniform vec2 u_scale;    // used corner of the pooled render targets
+attribute vec2 a_position;
+varying vec2 v_texcoord;
+
+void main(void)
+{
+    gl_Position = vec4(a_position, 0, 1);
+    v_texcoord = (a_position + 1.0) / 2.0 * u_scale;
+}
+"""
+
+# two-pass : accumulation (rgb * a * w, a * w), revealage r
+frag_compose = """
+uniform sampler2D tex_accumulation;
+uniform sampler2D tex_revealage;
+varying vec2 v_texcoord;
+
+void main(void)
+{
+    float r = texture2D(tex_revealage, v_texcoord).r;
+    if (r >= 1.0)
+        discard;
+    vec4 accum = texture2D(tex_accumulation, v_texcoord);
+    // blended with ONE_MINUS_SRC_ALPHA, SRC_ALPHA over the scene
+    gl_FragColor = vec4(accum.rgb / clamp(accum.a, 1e-4, 5e4), r);
+}
+"""
+
+# mrt : accumulation (rgb * a * w, revealage), weights a * w
+frag_compose_mrt = """
+uniform sampler2D tex_accumulation;
+uniform sampler2D tex_revealage;
+varying vec2 v_texcoord;
+
+void main(void)
+{
+    vec4 accum = texture2D(tex_accumulation, v_texcoord);
+    float r = accum.a;
+    if (r >= 1.0)
+        discard;
+    float w = texture2D(tex_revealage, v_texcoord).r;
+    gl_FragColor = vec4(accum.rgb / clamp(w, 1e-4, 5e4), r);
+}
+"""
+
+# pass uniform of the filters
+PASS_NONE, PASS_ACCUM, PASS_REVEAL = -1.0, 0.0, 1.0
+
+
+def mrt_supported(canvas):
+    """True if gl_FragData[1] can be rendered (PyOpenGL and 2 draw buffers)"""
+    if GL is None:
+        return False
+    canvas.set_current()
+    try:
+        return int(GL.glGetIntegerv(GL.GL_MAX_DRAW_BUFFERS)) >= 2
+    except Exception:  # pylint: disable=broad-except
+        return False
+
+
+class WBOITFilter(Filter):
+    """fragment weighting of a visual, one filter per visual"""
+
+    def __init__(self, mrt=False, wmax=3e3):
+        code = frag_weight_mrt if mrt else frag_weight
+        Filter.__init__(self, fcode=code, fhook="post", fpos=100)
+        self.mrt = mrt
+        self._rewritten = set()
+        self.fshader["weight"] = Function(weight_depth.replace("WMAX", "%.1f" % wmax))
+        self.fshader["pass"] = PASS_NONE
+
+    def _attach(self, visual):
+        Filter._attach(self, visual)
+        if self.mrt:
+            self._rewrite(visual)
+
+    def _detach(self, visual):
+        for func in self._rewritten:
+            func._replacements.pop("gl_FragColor", None)  # pylint: disable=W0212
+            func.changed(code_changed=True)
+        self._rewritten.clear()
+        Filter._detach(self, visual)
+
+    def _rewrite(self, visual):
+        """gl_FragColor to gl_FragData[0] in all the fragment functions
+
+        filters attached after this one are rewritten at the next pass.
+        """
+        for dep in visual.view_program.frag.dependencies():
+            if isinstance(dep, Function) and "gl_FragColor" in dep.code:
+                dep.replace("gl_FragColor", "gl_FragData[0]")
+                self._rewritten.add(dep)
+
+    def set_pass(self, value):
+        """PASS_NONE, PASS_ACCUM or PASS_REVEAL"""
+        if self.mrt and self.attached:
+            self._rewrite(self._visual)
+        self.fshader["pass"] = value
+
+
+class WeightedBlendedOIT(OITPass):
+    """order-independent transparency pass of a SceneCanvas"""
+
+    def __init__(self, canvas, nodes=(), mrt=None, pool=None, precision="float32"):
+        """
+        Parameters
+        ----------
+        canvas : SceneCanvas
+            the pass runs after the scene at every draw event
+        nodes : list
+            visuals to draw with OIT, see add
+        mrt : bool
+            single pass with multiple render targets, default to the
+            capability of the GL context (see mrt_supported)
+        precision : str
+            formats of the render targets, 'float32' (RGBA32F + R32F,
+            20 bytes per pixel), 'float16' (RGBA16F + R16F, 10 bytes) or
+            'float16-r8' (RGBA16F + R8, 9 bytes), see PRECISIONS
+        pool : RenderTargetPool
+            the float textures are taken from this pool at every draw,
+            default to rendertarget.default_pool
+        """
+        OITPass.__init__(self, canvas, pool)
+        self.mrt = mrt_supported(canvas) if mrt is None else bool(mrt)
+        if precision not in PRECISIONS:
+            raise ValueError("precision = " + precision + " not supported")
+        self.precision = precision
+        self.formats = PRECISIONS[precision][:2]
+        if self.mrt and self.formats[1] == "r8":
+            # the second target accumulates weights, not a product
+            self.formats = (self.formats[0], "r16f")
+
+        # post composition
+        fcode = frag_compose_mrt if self.mrt else frag_compose
+        compose = gloo.Program(vert_compose, fcode)
+        compose["a_position"] = np.array(
+            [(-1, -1), (-1, 1), (1, -1), (1, 1)], dtype=np.float32
+        )
+        self.compose = compose
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def path(self):
+        """'mrt' or 'two-pass'"""
+        return "mrt" if self.mrt else "two-pass"
+
+    def _filter(self):
+        """weighting of the fragments of a node"""
+        return WBOITFilter(self.mrt, PRECISIONS[self.precision][2])
+
+    def _bind_mrt(self, accum, reveal, bind=True):
+        """add (or remove) reveal as the second color target of accum.fbo"""
+        context = self.canvas.context
+        with accum.fbo:
+            # create the GL objects, then patch the bound framebuffer
+            context.flush_commands()
+            handle = 0
+            if bind:
+                handle = context.shared.parser.get_object(reveal.texture.id).handle
+            GL.glFramebufferTexture2D(
+                GL.GL_FRAMEBUFFER,
+                GL.GL_COLOR_ATTACHMENT1,
+                GL.GL_TEXTURE_2D,
+                handle,
+                0,
+            )
+            buffers = [GL.GL_COLOR_ATTACHMENT0, GL.GL_COLOR_ATTACHMENT1]
+            buffers = buffers if bind else buffers[:1]
+            GL.glDrawBuffers(len(buffers), buffers)
+
+    def _draw_pass(self, target, value, clear, blend_func):
+        """draw the visible OIT nodes into the corner of a render target"""
+        canvas = self.canvas
+        canvas.push_fbo(target.fbo, (0, 0), canvas.size)
+        canvas.push_viewport((0, 0) + target.size)
+        try:
+            canvas.context.clear(color=clear)
+            self._draw_nodes(
+                lambda filt: filt.set_pass(value),
+                blend=True,
+                depth_test=False,
+                cull_face=False,
+                blend_func=blend_func,
+            )
+        finally:
+            canvas.pop_viewport()
+            canvas.pop_fbo()
+
+    def on_draw(self, event):
+        """weighted passes and composition over the scene"""
+        if not self._show():
+            return
+        size = tuple(self.canvas.physical_size)
+        accum = self.pool.acquire(self.canvas, size, self.formats[0])
+        reveal = self.pool.acquire(self.canvas, size, self.formats[1])
+        if self.mrt:
+            # clear to (0, 0, 0, 1) : revealage starts at 1, weights at 0
+            self._bind_mrt(accum, reveal)
+            self._draw_pass(
+                accum,
+                PASS_ACCUM,
+                (0, 0, 0, 1),
+                ("one", "one", "zero", "one_minus_src_alpha"),
+            )
+            # pooled targets are single target framebuffers for other passes
+            self._bind_mrt(accum, reveal, bind=False)
+        else:
+            self._draw_pass(accum, PASS_ACCUM, (0, 0, 0, 0), ("one", "one"))
+            self._draw_pass(
+                reveal,
+                PASS_REVEAL,
+                (1, 1, 1, 1),
+                ("zero", "one_minus_src_color"),
+            )
+        for filt in self._filters.values():
+            filt.set_pass(PASS_NONE)
+
+        gloo.set_state(
+            blend=True,
+            depth_test=False,
+            blend_func=("one_minus_src_alpha", "src_alpha"),
+        )
+        self.compose["tex_accumulation"] = accum.texture
+        self.compose["tex_revealage"] = reveal.texture
+        self.compose["u_scale"] = accum.scale
+        self.compose.draw("triangle_strip")
+        self.pool.release(accum)
+        self.pool.release(reveal)